@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+# Ensure project root is in path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rich.console import Console
+
+from core.personality_loader import load_personalities
+from core.ollama_client import AsyncOllamaAgent, DEFAULT_MODEL
+from core.concurrency import ModelLimiter
+from core.arena import ArenaJob, build_matrix, run_arena
+
+# Progress goes to stderr so results can be piped from stdout
+console = Console(stderr=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run many conversations headlessly and write them to JSONL.")
+    parser.add_argument("--agents", nargs="+", help="Personality names or file names (e.g. software_engineer); "
+                                                     "every ordered pair is run. Defaults to all personalities.")
+    parser.add_argument("--topics", nargs="+", help="Topics to discuss")
+    parser.add_argument("--modes", nargs="+", default=["debate"], help="debate, discuss, fight and/or roast")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per conversation (2 messages each)")
+    parser.add_argument("--matrix", help="JSONL file of jobs: {agent_a, agent_b, topic, mode, rounds} per line, "
+                                         "instead of --agents/--topics/--modes")
+    parser.add_argument("--workers", type=int, default=4, help="Conversations run concurrently")
+    parser.add_argument("--rate", type=float, help="Maximum turns per second across all workers")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Ollama model to use")
+    parser.add_argument("--output", help="JSONL output file (default: stdout)")
+    return parser.parse_args()
+
+
+def find_personality(personalities, key):
+    for p in personalities:
+        stem = os.path.splitext(os.path.basename(p.filepath))[0]
+        if key.lower() in (p.name.lower(), stem.lower()):
+            return p
+    raise SystemExit(f"Unknown personality: {key}")
+
+
+def load_jobs(args, personalities):
+    if args.matrix:
+        jobs = []
+        with open(args.matrix, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                spec = json.loads(line)
+                jobs.append(ArenaJob(
+                    agent_a=find_personality(personalities, spec["agent_a"]),
+                    agent_b=find_personality(personalities, spec["agent_b"]),
+                    topic=spec["topic"],
+                    mode=spec.get("mode", "debate"),
+                    rounds=spec.get("rounds", args.rounds),
+                ))
+        return jobs
+
+    if not args.topics:
+        raise SystemExit("Either --topics or --matrix is required.")
+    selected = [find_personality(personalities, key) for key in args.agents] if args.agents else personalities
+    return build_matrix(selected, args.topics, args.modes, args.rounds)
+
+
+def main():
+    args = parse_args()
+
+    personalities_dir = os.path.join(os.path.dirname(__file__), 'data', 'personalities')
+    personalities = load_personalities(personalities_dir)
+    jobs = load_jobs(args, personalities)
+
+    # The worker pool is the concurrency cap for this run, so nothing should be rejected
+    limiter = ModelLimiter(max_concurrency=args.workers, max_queue=args.workers)
+
+    def agent_factory(personality, mode):
+        return AsyncOllamaAgent(name=personality.name, personality_description=personality.behavior_description,
+                                model_name=args.model, mode=mode, limiter=limiter)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    done = failed = failed_turns = 0
+
+    def on_result(result):
+        nonlocal done, failed, failed_turns
+        done += 1
+        failed += "error" in result
+        failed_turns += result["failed_turns"]
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        status = f"[red]error: {result['error']}[/red]" if "error" in result else f"{result['elapsed_s']:.1f}s"
+        console.print(f"[{done}/{len(jobs)}, {failed} failed] {result['agent_a']} vs {result['agent_b']} "
+                      f"({result['mode']}): {status}")
+
+    console.print(f"Running {len(jobs)} conversations with {args.workers} workers...")
+    try:
+        asyncio.run(run_arena(jobs, agent_factory, workers=args.workers, rate=args.rate, on_result=on_result))
+    except KeyboardInterrupt:
+        console.print("\n[red]Arena interrupted by user.[/red]")
+    else:
+        console.print(f"Done: {done - failed} conversations completed, {failed} failed ({failed_turns} failed turns).")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Overload test for admission control (core/admission.py) against the fake Ollama backend.
+
+Runs the API twice, with ADMISSION=0 and with admission control on, and drives it with
+  - polite clients: one /next every --think seconds each, backing off on 429 / 503
+  - greedy clients: --greedy-concurrency requests in flight each, retrying immediately
+Every client gets its own address through X-Forwarded-For (ADMISSION_TRUST_PROXY=1).
+The offered load is several times what the backend can generate. Reported per client
+class: status counts and latency percentiles of the successful calls. With admission
+on, the greedy clients are turned away with 429 and the polite clients' tail stays
+close to one generation; without it, everyone queues behind the greedy backlog.
+
+Usage: python benchmarks/bench_admission.py --duration 15 --polite 8 --greedy 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import httpx
+
+from benchmarks.bench_server import free_port, print_latencies, start_api, wait_ready
+from benchmarks.fake_ollama import FakeOllamaServer
+
+
+async def open_session(client: httpx.AsyncClient, headers: dict, names: list, i: int, deadline: float):
+    body = {"agent_a_name": names[i % len(names)], "agent_b_name": names[(i + 1) % len(names)],
+            "topic": f"overload topic {i}", "mode": "debate"}
+    while time.monotonic() < deadline:
+        res = await client.post("/api/conversation/start", json=body, headers=headers)
+        if res.status_code == 200:
+            return res.json()["session_id"]
+        await asyncio.sleep(float(res.headers.get("retry-after", 1)))
+    return None
+
+
+async def drive(base_url: str, duration: float, polite: int, greedy: int, greedy_concurrency: int, think: float):
+    results = {"polite": (Counter(), []), "greedy": (Counter(), [])}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=1000)) as client:
+        names = [p["name"] for p in (await client.get("/api/personalities")).json()]
+        deadline = time.monotonic() + duration
+
+        async def call(kind: str, session_id: str, headers: dict) -> httpx.Response:
+            statuses, latencies = results[kind]
+            t = time.perf_counter()
+            try:
+                res = await client.post("/api/conversation/next", params={"session_id": session_id}, headers=headers)
+            except httpx.HTTPError:
+                statuses["error"] += 1
+                return None
+            statuses[res.status_code] += 1
+            if res.status_code == 200:
+                latencies.append(time.perf_counter() - t)
+            return res
+
+        async def polite_client(i: int):
+            headers = {"X-Forwarded-For": f"10.0.0.{i + 1}"}
+            session_id = await open_session(client, headers, names, i, deadline)
+            while session_id and time.monotonic() < deadline:
+                res = await call("polite", session_id, headers)
+                wait = think
+                if res is not None and res.status_code in (429, 503):
+                    wait = max(think, float(res.headers.get("retry-after", 1)))
+                await asyncio.sleep(wait)
+
+        async def greedy_client(i: int):
+            headers = {"X-Forwarded-For": f"10.0.1.{i + 1}"}
+            session_id = await open_session(client, headers, names, 100 + i, deadline)
+
+            async def hammer():
+                while session_id and time.monotonic() < deadline:
+                    res = await call("greedy", session_id, headers)
+                    if res is None or res.status_code != 200:
+                        await asyncio.sleep(0.05)  # Ignores Retry-After, but leaves the CPU to the server
+
+            await asyncio.gather(*(hammer() for _ in range(greedy_concurrency)))
+
+        await asyncio.gather(*(polite_client(i) for i in range(polite)),
+                             *(greedy_client(i) for i in range(greedy)))
+    return results
+
+
+def run(label: str, fake: FakeOllamaServer, args, env: dict):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    api = start_api(port, fake.url, {"OLLAMA_MAX_CONCURRENCY": str(args.capacity), "ADMISSION_TRUST_PROXY": "1",
+                                     "OLLAMA_MAX_QUEUE": "10000", "WARMUP": "wait", **env})
+    try:
+        wait_ready(base_url)
+        results = asyncio.run(drive(base_url, args.duration, args.polite, args.greedy,
+                                    args.greedy_concurrency, args.think))
+        admission = httpx.get(f"{base_url}/api/admission/stats").json()
+    finally:
+        api.terminate()
+        api.wait()
+
+    print(f"\n== {label} ==")
+    for kind, (statuses, latencies) in results.items():
+        counts = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str))
+        print_latencies(f"{kind} /next (200s)", latencies)
+        print(f"{'':<28} {counts}")
+    if admission["enabled"]:
+        print(f"{'admission':<28} {admission['max_concurrency']} slots + {admission['max_queue']} queued, "
+              f"avg slot {admission['avg_service_ms']}ms, rejected {admission['rejected']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overload the API and compare tail latency with and without admission control.")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load per run")
+    parser.add_argument("--polite", type=int, default=8, help="Well-behaved clients")
+    parser.add_argument("--think", type=float, default=1.0, help="Seconds between a polite client's requests")
+    parser.add_argument("--greedy", type=int, default=4, help="Clients calling /next in a tight loop")
+    parser.add_argument("--greedy-concurrency", type=int, default=16, help="Requests each greedy client keeps in flight")
+    parser.add_argument("--capacity", type=int, default=4, help="Generations the backend runs at once")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Fake model token rate")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model first-token latency (s)")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    fake = FakeOllamaServer(("127.0.0.1", 0), args.tokens_per_sec, args.latency, args.reply_tokens)
+    fake.start_in_thread()
+    generation = args.latency + args.reply_tokens / args.tokens_per_sec
+    offered = args.polite / args.think + args.greedy * args.greedy_concurrency / generation
+    print(f"Fake model: ~{generation * 1000:.0f}ms per generation, capacity {args.capacity} at once "
+          f"(~{args.capacity / generation:.0f} req/s); offered load ~{offered:.0f} req/s")
+    try:
+        run("admission off (ADMISSION=0)", fake, args, {"ADMISSION": "0"})
+        run("admission on", fake, args, {"ADMISSION": "1"})
+    finally:
+        fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for per-turn history bookkeeping in ConversationManager.
+
+Compares the incremental per-agent views against rebuilding the whole
+message list every turn (the previous behaviour). The agent is a no-op,
+so the numbers are pure manager overhead.
+
+Usage: python benchmarks/bench_history.py
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.agent_interface import Agent
+from core.manager import ConversationManager
+
+
+class EchoAgent(Agent):
+    def generate_response(self, conversation_history):
+        return "A reasonably short reply that looks like a real turn, with a punchline."
+
+
+def rebuild_history(topic, turns, speaker_name):
+    # What next_turn used to do on every call
+    history_for_llm = [{'role': 'user', 'content': f"Topic: {topic}"}]
+    for entry in turns:
+        role = 'assistant' if entry['name'] == speaker_name else 'user'
+        content = entry['message']
+        if role == 'user':
+            content = f"{entry['name']}: {content}"
+        history_for_llm.append({'role': role, 'content': content})
+    return history_for_llm
+
+
+def bench_incremental(turns: int) -> float:
+    manager = ConversationManager([EchoAgent("A", ""), EchoAgent("B", "")], "benchmarks", verbose=False)
+    manager.initialize_conversation()
+    start = time.perf_counter()
+    for _ in range(turns):
+        manager.next_turn()
+    return (time.perf_counter() - start) / turns
+
+
+def bench_rebuild(turns: int) -> float:
+    agents = [EchoAgent("A", ""), EchoAgent("B", "")]
+    log = [{"name": "A", "message": agents[0].generate_response([])}]
+    start = time.perf_counter()
+    for i in range(turns):
+        speaker = agents[(i + 1) % 2]
+        reply = speaker.generate_response(rebuild_history("benchmarks", log, speaker.name))
+        log.append({"name": speaker.name, "message": reply})
+    return (time.perf_counter() - start) / turns
+
+
+def main():
+    print(f"{'turns':>6} {'rebuild (us/turn)':>18} {'incremental (us/turn)':>22}")
+    for turns in (10, 100, 1000):
+        # Warm up, then take the best of a few runs
+        rebuild = min(bench_rebuild(turns) for _ in range(5))
+        incremental = min(bench_incremental(turns) for _ in range(5))
+        print(f"{turns:>6} {rebuild * 1e6:>18.2f} {incremental * 1e6:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
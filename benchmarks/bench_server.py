@@ -0,0 +1,187 @@
+"""
+End-to-end benchmark of server.py against the fake Ollama backend.
+
+Starts benchmarks/fake_ollama.py in-process and the API under uvicorn in a
+subprocess, then drives many sessions concurrently and reports:
+  - the very first /api/conversation/start (cold model unless the API warmed it up)
+  - /api/conversation/start and /next latency percentiles
+  - sessions/sec
+  - memory per session (tracemalloc, in-process with FakeAgent)
+  - per-turn ConversationManager overhead (see bench_history.py)
+
+Usage: python benchmarks/bench_server.py --sessions 50 --turns 6 --concurrency 10
+"""
+import argparse
+import asyncio
+import gc
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import httpx
+
+from benchmarks.bench_history import bench_incremental
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.fake_agent import FakeAgent
+from core.manager import ConversationManager
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": ordered[-1]}
+
+
+def print_latencies(label, samples):
+    stats = percentiles(samples)
+    print(f"{label:<28} n={len(samples):<5} " + "  ".join(f"{k}={v * 1000:8.1f}ms" for k, v in stats.items()))
+
+
+def start_api(port: int, ollama_url: str, extra_env=None) -> subprocess.Popen:
+    env = {**os.environ, "OLLAMA_HOST": ollama_url, **(extra_env or {})}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/personalities").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not start in time")
+
+
+async def drive(base_url: str, sessions: int, turns: int, concurrency: int):
+    start_latencies, next_latencies, errors = [], [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        names = [p["name"] for p in (await client.get("/api/personalities")).json()]
+
+        async def one_session(i: int):
+            nonlocal errors
+            async with semaphore:
+                body = {"agent_a_name": names[i % len(names)], "agent_b_name": names[(i + 1) % len(names)],
+                        "topic": f"benchmark topic {i}", "mode": "debate"}
+                t = time.perf_counter()
+                res = await client.post("/api/conversation/start", json=body)
+                start_latencies.append(time.perf_counter() - t)
+                if res.status_code != 200:
+                    errors += 1
+                    return
+                session_id = res.json()["session_id"]
+                for _ in range(turns):
+                    t = time.perf_counter()
+                    res = await client.post("/api/conversation/next", params={"session_id": session_id})
+                    next_latencies.append(time.perf_counter() - t)
+                    if res.status_code != 200:
+                        errors += 1
+                await client.post("/api/conversation/reset", params={"session_id": session_id})
+
+        t = time.perf_counter()
+        await asyncio.gather(*(one_session(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - t
+
+    return start_latencies, next_latencies, errors, elapsed
+
+
+def first_start(base_url: str) -> float:
+    """Latency of the first session started after the API came up."""
+    names = [p["name"] for p in httpx.get(f"{base_url}/api/personalities").json()]
+    t = time.perf_counter()
+    res = httpx.post(f"{base_url}/api/conversation/start", timeout=120,
+                     json={"agent_a_name": names[0], "agent_b_name": names[1], "topic": "first", "mode": "debate"})
+    elapsed = time.perf_counter() - t
+    httpx.post(f"{base_url}/api/conversation/reset", params={"session_id": res.json()["session_id"]})
+    return elapsed
+
+
+def bench_memory(sessions: int, turns: int) -> float:
+    """Bytes retained per session after `turns` turns, with a zero-latency FakeAgent."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    managers = []
+    for i in range(sessions):
+        agent_a = FakeAgent(f"A{i}", "", tokens_per_sec=0, first_token_latency=0)
+        agent_b = FakeAgent(f"B{i}", "", tokens_per_sec=0, first_token_latency=0)
+        manager = ConversationManager([agent_a, agent_b], f"topic {i}", verbose=False)
+        manager.initialize_conversation()
+        for _ in range(turns):
+            manager.next_turn()
+        managers.append(manager)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against a fake Ollama backend.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=6, help="/next calls per session")
+    parser.add_argument("--concurrency", type=int, default=10, help="Sessions driven at once")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Fake model token rate")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model first-token latency (s)")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--load-time", type=float, default=2.0, help="Fake model load time on first use (s)")
+    parser.add_argument("--warmup", choices=("0", "1", "wait"), default="wait", help="The API's WARMUP setting")
+    args = parser.parse_args()
+
+    fake = FakeOllamaServer(("127.0.0.1", 0), args.tokens_per_sec, args.latency, args.reply_tokens, args.load_time)
+    fake.start_in_thread()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # Every session comes from this one address, so the per-client rate limit is turned off
+    api = start_api(port, fake.url, {"OLLAMA_MAX_CONCURRENCY": str(args.concurrency * 2), "ADMISSION": "0",
+                                     "WARMUP": args.warmup})
+    try:
+        started = time.perf_counter()
+        wait_ready(base_url)
+        ready = time.perf_counter() - started
+        first = first_start(base_url)
+        start_latencies, next_latencies, errors, elapsed = asyncio.run(
+            drive(base_url, args.sessions, args.turns, args.concurrency)
+        )
+    finally:
+        api.terminate()
+        api.wait()
+        fake.shutdown()
+
+    ideal_turn = args.latency + args.reply_tokens / args.tokens_per_sec
+    print(f"Fake model: {args.latency * 1000:.0f}ms to first token, {args.tokens_per_sec:.0f} tok/s, "
+          f"{args.reply_tokens} tokens/reply (~{ideal_turn * 1000:.0f}ms per generation), "
+          f"{args.load_time:.1f}s model load")
+    print(f"{'API ready':<28} {ready * 1000:.0f}ms with WARMUP={args.warmup}")
+    print(f"{'first /start':<28} {first * 1000:.1f}ms")
+    print_latencies("POST /api/conversation/start", start_latencies)
+    print_latencies("POST /api/conversation/next", next_latencies)
+    print(f"{'sessions/sec':<28} {args.sessions / elapsed:.2f}  ({args.sessions} sessions, {errors} errors, "
+          f"{elapsed:.1f}s)")
+    print(f"{'memory/session':<28} {bench_memory(200, args.turns) / 1024:.1f} KiB after {args.turns + 1} turns")
+    for turns in (10, 100, 1000):
+        print(f"{'manager overhead/turn':<28} {bench_incremental(turns) * 1e6:.2f}us at {turns} turns")
+
+
+if __name__ == "__main__":
+    main()
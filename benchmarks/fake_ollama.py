@@ -0,0 +1,164 @@
+"""
+A fake Ollama server for benchmarks and load tests.
+
+Speaks enough of the Ollama HTTP API (/api/chat, /api/generate, /api/tags,
+/api/ps) for the ollama Python client, with deterministic replies and a
+configurable first-token latency, token rate and model load time.
+
+Usage: python benchmarks/fake_ollama.py --port 11435 --tokens-per-sec 50 --latency 0.2
+       OLLAMA_HOST=http://127.0.0.1:11435 python3 -m uvicorn server:app
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.fake_agent import fake_reply
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, tokens_per_sec: float = 50.0, latency: float = 0.1, reply_tokens: int = 40,
+                 load_time: float = 0.0):
+        super().__init__(address, FakeOllamaHandler)
+        self.tokens_per_sec = tokens_per_sec
+        self.latency = latency
+        self.reply_tokens = reply_tokens
+        self.load_time = load_time  # Paid by the first request for each model, like a cold model load
+        self.loaded_models = set()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_in_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/":
+            return self._send_json({"status": "Ollama is running"})
+        if self.path == "/api/tags":
+            return self._send_json({"models": [{"name": name, "model": name} for name in sorted(self.server.loaded_models)]})
+        if self.path == "/api/ps":
+            return self._send_json({"models": [{"name": name, "model": name} for name in sorted(self.server.loaded_models)]})
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server._lock:
+            self.server.requests += 1
+        load = 0.0
+        with self.server._load_lock:
+            # Requests for a model that is still loading wait for it, as with Ollama
+            if body.get("model", "") not in self.server.loaded_models:
+                load = self.server.load_time
+                time.sleep(load)
+                self.server.loaded_models.add(body.get("model", ""))
+
+        if self.path == "/api/chat":
+            return self._generate(body, body.get("messages") or [], chat=True, load=load)
+        if self.path == "/api/generate":
+            messages = [{'role': 'user', 'content': body.get("prompt", "")}]
+            return self._generate(body, messages, chat=False, load=load)
+        self._send_json({"error": "not found"}, status=404)
+
+    def _generate(self, body, messages, chat: bool, load: float = 0.0):
+        server = self.server
+        num_predict = (body.get("options") or {}).get("num_predict") or server.reply_tokens
+        tokens = fake_reply(messages, min(server.reply_tokens, num_predict)) if messages[-1:] and messages[-1]['content'] else []
+        token_delay = 1.0 / server.tokens_per_sec if server.tokens_per_sec else 0.0
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages) // 4
+        started = time.perf_counter()
+        time.sleep(server.latency)
+
+        def chunk(text, done=False):
+            data = {"model": body.get("model", ""), "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if done:
+                data.update({
+                    "done_reason": "stop",
+                    "total_duration": int((time.perf_counter() - started) * 1e9),
+                    "load_duration": int(load * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(server.latency * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(len(tokens) * token_delay * 1e9),
+                })
+            return data
+
+        if not body.get("stream", True):
+            time.sleep(token_delay * len(tokens))
+            return self._send_json(chunk("".join(tokens).strip(), done=True))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                self._write_chunk(chunk(token))
+                time.sleep(token_delay)
+            self._write_chunk(chunk("", done=True))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # The client stopped reading, e.g. at the output limit
+
+    def _write_chunk(self, data):
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, data, status: int = 200):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server with deterministic replies.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds before the first token")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--load-time", type=float, default=0.0, help="Seconds to 'load' each model on first use")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), args.tokens_per_sec, args.latency, args.reply_tokens,
+                              args.load_time)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Union
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away. `retry_after` is a hint in seconds."""
+
+    def __init__(self, detail: str, retry_after: float, reason: str):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.reason = reason  # "rate_limited", "queue_full" or "queue_timeout"
+
+    @property
+    def retry_after_header(self) -> str:
+        # Retry-After only takes whole seconds
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`; every request takes one."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Takes a token and returns 0, or returns how many seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class AdmissionController:
+    """
+    Admission control in front of the generation endpoints.
+
+    Each client gets a token bucket (`rate` requests per second, bursts of `burst`);
+    a client that runs out is rejected straight away. Admitted requests then share
+    `max_concurrency` slots, sized to what the backends can generate at once (pass a
+    callable to follow the model limiter as endpoints come and go). Up to
+    `max_queue` more wait for a slot (at most `queue_timeout` seconds) and anything
+    beyond that is rejected immediately, so the wait in front of the model, and with
+    it tail latency, stays bounded however much traffic arrives.
+    """
+
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self, rate: float = 2.0, burst: float = 10, max_concurrency: Union[int, Callable[[], int]] = 4,
+                 max_queue: int = 8, queue_timeout: float = 10.0, enabled: bool = True):
+        self.rate = rate
+        self.burst = burst
+        self._limit = max_concurrency if callable(max_concurrency) else (lambda: max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._service_time = 1.0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    @classmethod
+    def from_env(cls, backend_capacity: Callable[[], int]) -> "AdmissionController":
+        """
+        ADMISSION=0 turns it off. ADMISSION_RATE / ADMISSION_BURST set the per-client bucket,
+        ADMISSION_MAX_CONCURRENCY fixes the slot count (by default it follows `backend_capacity`),
+        ADMISSION_MAX_QUEUE defaults to twice the starting slot count.
+        """
+        max_concurrency = backend_capacity
+        if os.environ.get("ADMISSION_MAX_CONCURRENCY"):
+            max_concurrency = int(os.environ["ADMISSION_MAX_CONCURRENCY"])
+        slots = max_concurrency() if callable(max_concurrency) else max_concurrency
+        return cls(
+            rate=float(os.environ.get("ADMISSION_RATE", 2.0)),
+            burst=float(os.environ.get("ADMISSION_BURST", 10)),
+            max_concurrency=max_concurrency,
+            max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", slots * 2)),
+            queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 10.0)),
+            enabled=os.environ.get("ADMISSION", "1") != "0",
+        )
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(1, self._limit())
+
+    def _full(self) -> bool:
+        return self._running >= self.max_concurrency or bool(self._waiters)
+
+    def _reject(self, detail: str, retry_after: float, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(detail, retry_after, reason)
+
+    def _busy_retry_after(self) -> float:
+        # Roughly when the queue ahead would have drained
+        return self._service_time * (len(self._waiters) + 1) / self.max_concurrency
+
+    def _wait_for_token(self, client: str) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.MAX_TRACKED_CLIENTS:
+                # An evicted client just starts again with a full bucket
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take(now)
+
+    def take(self, client: str):
+        """Charges one request to the client's bucket, raising AdmissionRejected if it is empty."""
+        if not self.enabled:
+            return
+        wait = self._wait_for_token(client)
+        if wait:
+            raise self._reject("Too many requests from this client", wait, "rate_limited")
+
+    def check(self, client: str):
+        """Rate limit plus a fast queue-full check, before any work (or response) starts."""
+        if not self.enabled:
+            return
+        self.take(client)
+        if self._full() and len(self._waiters) >= self.max_queue:
+            raise self._reject("Server is at capacity", self._busy_retry_after(), "queue_full")
+
+    async def pace(self, client: str):
+        """Like take(), but waits for the token instead of rejecting (server-driven auto mode)."""
+        if not self.enabled:
+            return
+        while True:
+            wait = self._wait_for_token(client)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of the max_concurrency generation slots, waiting in the bounded queue if needed."""
+        if not self.enabled:
+            yield
+            return
+        if self._full():
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject("Server is at capacity", self._busy_retry_after(), "queue_full")
+            # FIFO; _release() hands the slot over by resolving the future
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._remove(waiter)
+                raise self._reject("Timed out waiting for capacity", self._busy_retry_after(), "queue_timeout")
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()  # Granted just before the cancel landed
+                else:
+                    self._remove(waiter)
+                raise
+        else:
+            self._running += 1
+
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release()
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+
+    def _remove(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self):
+        self._running -= 1
+        # Also fills slots added since (an endpoint came back)
+        while self._waiters and self._running < self.max_concurrency:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._running += 1
+
+    @asynccontextmanager
+    async def admit(self, client: str):
+        """check() and slot() together, for request/response endpoints."""
+        self.check(client)
+        async with self.slot():
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._running,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "clients": len(self._buckets),
+            "avg_service_ms": round(self._service_time * 1000, 1),
+        }
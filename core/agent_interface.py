@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Iterator, AsyncIterator
 
 class Agent(ABC):
     def __init__(self, name: str, personality_description: str):
@@ -13,3 +14,21 @@ class Agent(ABC):
         conversation_history: List of dicts with 'role' and 'content'.
         """
         pass
+
+    def stream_response(self, conversation_history: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Yields the response in chunks as they are generated.
+        Agents that can't stream just yield the whole response once.
+        """
+        yield self.generate_response(conversation_history)
+
+    async def agenerate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        """
+        Async version of generate_response.
+        By default the blocking call runs in a worker thread; async agents override this.
+        """
+        return await asyncio.to_thread(self.generate_response, conversation_history)
+
+    async def astream_response(self, conversation_history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Async version of stream_response."""
+        yield await self.agenerate_response(conversation_history)
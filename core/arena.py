@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .agent_interface import Agent
+from .concurrency import RateLimiter
+from .manager import ConversationManager
+from .personality_loader import Personality
+
+# (personality, mode) -> Agent
+AgentFactory = Callable[[Personality, str], Agent]
+
+
+@dataclass
+class ArenaJob:
+    agent_a: Personality
+    agent_b: Personality
+    topic: str
+    mode: str = "debate"
+    rounds: int = 5
+
+
+def build_matrix(personalities: List[Personality], topics: Iterable[str], modes: Iterable[str],
+                 rounds: int) -> List[ArenaJob]:
+    """Every ordered pair of distinct personalities, for every topic and mode."""
+    return [
+        ArenaJob(agent_a=a, agent_b=b, topic=topic, mode=mode, rounds=rounds)
+        for topic, mode in itertools.product(topics, modes)
+        for a, b in itertools.permutations(personalities, 2)
+    ]
+
+
+async def run_job(job: ArenaJob, agent_factory: AgentFactory, rate_limiter: Optional[RateLimiter] = None) -> Dict:
+    """
+    Runs one conversation headlessly (rounds * 2 messages, like start_conversation).
+    Stops at the first failed turn and sets "error": agents report failed calls as a
+    message with an `error` stat rather than raising.
+    """
+    agent_a = agent_factory(job.agent_a, job.mode)
+    agent_b = agent_factory(job.agent_b, job.mode)
+    manager = ConversationManager([agent_a, agent_b], job.topic, verbose=False)
+
+    result = {
+        "agent_a": job.agent_a.name,
+        "agent_b": job.agent_b.name,
+        "topic": job.topic,
+        "mode": job.mode,
+        "rounds": job.rounds,
+        "turns": [],
+        "failed_turns": 0,
+    }
+    start = time.perf_counter()
+    try:
+        for i in range(job.rounds * 2):
+            if rate_limiter:
+                await rate_limiter.wait()
+            turn_start = time.perf_counter()
+            if i == 0:
+                speaker, message = await manager.ainitialize_conversation()
+            else:
+                speaker, message = await manager.anext_turn()
+            stats = getattr(speaker, 'last_stats', None)
+            result["turns"].append({
+                "speaker": speaker.name,
+                "message": message,
+                "latency_s": round(time.perf_counter() - turn_start, 4),
+                "stats": stats,
+            })
+            if stats and stats.get('error'):
+                result["failed_turns"] += 1
+                result["error"] = message
+                break
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        manager.close()
+    result["elapsed_s"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+async def run_arena(jobs: List[ArenaJob], agent_factory: AgentFactory, workers: int = 4,
+                    rate: Optional[float] = None, on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """
+    Runs jobs on a pool of `workers` concurrent conversations, optionally capped
+    at `rate` turns per second overall. on_result is called as each one finishes.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    rate_limiter = RateLimiter(rate) if rate else None
+    results = []
+
+    async def worker():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await run_job(job, agent_factory, rate_limiter)
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    return results
@@ -0,0 +1,285 @@
+import asyncio
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from .router import get_router
+
+
+class QueueFullError(Exception):
+    """Raised when a model's wait queue is already at its limit."""
+    pass
+
+
+class ModelLimiter:
+    """
+    Caps how many generations run at once per model, with a bounded wait queue.
+    Requests beyond the limit wait their turn; requests beyond limit + max_queue
+    are rejected right away with QueueFullError, which keeps tail latency bounded
+    instead of letting the backlog grow.
+    max_concurrency (and per_model) are per endpoint: the limit is that times the
+    number of endpoints serving requests, as reported by `endpoints`.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32,
+                 per_model: Optional[Dict[str, int]] = None,
+                 endpoints: Optional[Callable[[], int]] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.per_model = per_model or {}
+        self.endpoints = endpoints or (lambda: 1)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._sizes: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelLimiter":
+        """
+        OLLAMA_MAX_CONCURRENCY / OLLAMA_MAX_QUEUE set the defaults,
+        OLLAMA_MODEL_CONCURRENCY overrides per model, e.g. "mistral=2,llama3=4".
+        """
+        per_model = {}
+        for item in os.environ.get("OLLAMA_MODEL_CONCURRENCY", "").split(","):
+            if "=" in item:
+                model, limit = item.split("=", 1)
+                per_model[model.strip()] = int(limit)
+        return cls(
+            max_concurrency=int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 4)),
+            max_queue=int(os.environ.get("OLLAMA_MAX_QUEUE", 32)),
+            per_model=per_model,
+            endpoints=lambda: get_router().serving_endpoints(),
+        )
+
+    def endpoint_limit(self, model: str) -> int:
+        """Generations of `model` allowed at once on one endpoint (its parallel slots)."""
+        return self.per_model.get(model, self.max_concurrency)
+
+    def limit_for(self, model: str) -> int:
+        """Generations of `model` allowed at once across all endpoints."""
+        return self.endpoint_limit(model) * max(1, self.endpoints())
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        # Sized once, on first use; BatchScheduler follows endpoints going down and coming back
+        if model not in self._semaphores:
+            self._sizes[model] = self.limit_for(model)
+            self._semaphores[model] = asyncio.Semaphore(self._sizes[model])
+        return self._semaphores[model]
+
+    @asynccontextmanager
+    async def slot(self, model: str, key: Optional[Hashable] = None):
+        # `key` (the session) is only used by BatchScheduler
+        semaphore = self._semaphore(model)
+        if semaphore.locked() and self._waiting.get(model, 0) >= self.max_queue:
+            raise QueueFullError(f"Too many pending requests for model '{model}'")
+
+        self._waiting[model] = self._waiting.get(model, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[model] -= 1
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            model: {
+                "limit": self._sizes[model],
+                "in_flight": self._sizes[model] - semaphore._value,
+                "waiting": self._waiting.get(model, 0),
+            }
+            for model, semaphore in self._semaphores.items()
+        }
+
+
+class _Waiter:
+    __slots__ = ("future", "key", "enqueued")
+
+    def __init__(self, future: asyncio.Future, key: Hashable, enqueued: float):
+        self.future = future
+        self.key = key
+        self.enqueued = enqueued
+
+
+class BatchScheduler(ModelLimiter):
+    """
+    ModelLimiter that hands out slots in micro-batches instead of strict FIFO.
+
+    Requests for the same model that arrive within `window` seconds are released
+    together, up to the model's limit (set the per-endpoint limit to each backend's
+    OLLAMA_NUM_PARALLEL so every Ollama decodes its share in one batch). The limit
+    follows the router's healthy endpoint count as endpoints go down and come back. When there are more waiters than free
+    slots, sessions are served round-robin, least recently served first, so one
+    busy session (e.g. turn + prefetch) can't crowd out the others. Anything that
+    has waited longer than `max_delay` goes first regardless.
+    With window=0 an idle model dispatches immediately, so no delay is added.
+    """
+
+    MAX_TRACKED_KEYS = 10000
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32,
+                 per_model: Optional[Dict[str, int]] = None,
+                 endpoints: Optional[Callable[[], int]] = None,
+                 window: float = 0.0, max_delay: float = 0.25):
+        super().__init__(max_concurrency, max_queue, per_model, endpoints)
+        self.window = window
+        self.max_delay = max_delay
+        self._pending: Dict[str, List[_Waiter]] = {}
+        self._running: Dict[str, int] = {}
+        self._scheduled: set = set()
+        self._last_served: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.batches = 0
+        self.dispatched = 0
+        self.overdue = 0
+
+    @classmethod
+    def from_env(cls) -> "BatchScheduler":
+        """
+        Same variables as ModelLimiter, plus OLLAMA_NUM_PARALLEL (overrides
+        OLLAMA_MAX_CONCURRENCY), OLLAMA_BATCH_WINDOW_MS and OLLAMA_BATCH_MAX_DELAY_MS.
+        """
+        limiter = ModelLimiter.from_env()
+        return cls(
+            max_concurrency=int(os.environ.get("OLLAMA_NUM_PARALLEL", limiter.max_concurrency)),
+            max_queue=limiter.max_queue,
+            per_model=limiter.per_model,
+            endpoints=limiter.endpoints,
+            window=float(os.environ.get("OLLAMA_BATCH_WINDOW_MS", 0)) / 1000,
+            max_delay=float(os.environ.get("OLLAMA_BATCH_MAX_DELAY_MS", 250)) / 1000,
+        )
+
+    @asynccontextmanager
+    async def slot(self, model: str, key: Optional[Hashable] = None):
+        pending = self._pending.setdefault(model, [])
+        if len(pending) >= self.max_queue:
+            raise QueueFullError(f"Too many pending requests for model '{model}'")
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), key, loop.time())
+        pending.append(waiter)
+        self._schedule(model)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just before the cancel landed
+                self._release(model)
+            elif waiter in pending:
+                pending.remove(waiter)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    def _free(self, model: str) -> int:
+        return self.limit_for(model) - self._running.get(model, 0)
+
+    def _schedule(self, model: str):
+        if model in self._scheduled:
+            return
+        if self.window > 0 and self._free(model) > 0:
+            # Hold the first request briefly so others arriving can join its batch
+            self._scheduled.add(model)
+            asyncio.get_running_loop().call_later(self.window, self._dispatch, model)
+        else:
+            self._dispatch(model)
+
+    def _release(self, model: str):
+        self._running[model] -= 1
+        # Waiters still queued have already paid their delay; fill the slot now
+        self._dispatch(model)
+
+    def _dispatch(self, model: str):
+        self._scheduled.discard(model)
+        pending = self._pending.get(model)
+        free = self._free(model)
+        if not pending or free <= 0:
+            return
+
+        now = asyncio.get_running_loop().time()
+        chosen = self._pick(pending, free, now)
+        for waiter in chosen:
+            pending.remove(waiter)
+            waiter.future.set_result(None)
+            if waiter.key is not None:
+                self._last_served[waiter.key] = now
+                self._last_served.move_to_end(waiter.key)
+        while len(self._last_served) > self.MAX_TRACKED_KEYS:
+            self._last_served.popitem(last=False)
+
+        self._running[model] = self._running.get(model, 0) + len(chosen)
+        if chosen:
+            self.batches += 1
+            self.dispatched += len(chosen)
+
+    def _pick(self, pending: List[_Waiter], free: int, now: float) -> List[_Waiter]:
+        live = [w for w in pending if not w.future.done()]
+
+        # Requests past the delay cap go first, oldest first
+        overdue = [w for w in live if now - w.enqueued >= self.max_delay][:free]
+        self.overdue += len(overdue)
+        chosen = list(overdue)
+        if len(chosen) >= free:
+            return chosen
+
+        # Then one request per session per round, least recently served session first
+        taken = set(map(id, chosen))
+        by_key: "OrderedDict[Hashable, List[_Waiter]]" = OrderedDict()
+        rest = [w for w in live if id(w) not in taken]
+        rest.sort(key=lambda w: (self._last_served.get(w.key, 0.0), w.enqueued))
+        for w in rest:
+            by_key.setdefault(w.key if w.key is not None else id(w), []).append(w)
+        while len(chosen) < free and by_key:
+            for key in list(by_key):
+                chosen.append(by_key[key].pop(0))
+                if not by_key[key]:
+                    del by_key[key]
+                if len(chosen) >= free:
+                    break
+        return chosen
+
+    def stats(self) -> Dict[str, Any]:
+        models = {
+            model: {
+                "limit": self.limit_for(model),
+                "in_flight": self._running.get(model, 0),
+                "waiting": len(self._pending.get(model, [])),
+            }
+            for model in set(self._pending) | set(self._running)
+        }
+        return {
+            "window_ms": self.window * 1000,
+            "max_delay_ms": self.max_delay * 1000,
+            "batches": self.batches,
+            "dispatched": self.dispatched,
+            "avg_batch_size": round(self.dispatched / self.batches, 2) if self.batches else 0.0,
+            "overdue": self.overdue,
+            "models": models,
+        }
+
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second across all callers."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# Shared by every async agent in the process
+model_limiter = BatchScheduler.from_env()
@@ -0,0 +1,128 @@
+import re
+from typing import Any, Dict, Optional, Tuple
+
+# A sentence ends at . ! ? or … (plus closing quotes/brackets) followed by whitespace,
+# except after initials / "e.g." style abbreviations and a few common titles
+_SENTENCE_END = re.compile(r"(?<![^A-Za-z][A-Za-z])(?<!\bMr)(?<!\bMrs)(?<!\bDr)(?<!\bvs)[.!?…]+[\"'”’)\]]*(?=\s)")
+# The model starting to write another speaker's line ("\nBob:") breaks the one-bubble rule
+_OTHER_SPEAKER = re.compile(r"\n[^\n:]{1,40}:")
+
+
+class OutputLimits:
+    """
+    The per-mode output limits from the system prompt, enforced instead of just requested.
+    options() bounds generation on the Ollama side (num_predict, stop sequences);
+    trimmer() cuts the reply locally at the sentence or character limit, so
+    streaming callers can abort the generation as soon as the limit is reached.
+    """
+    __slots__ = ("max_sentences", "max_chars", "stop", "chars_per_token")
+
+    def __init__(self, max_sentences: int = 2, max_chars: int = 280, stop: Tuple[str, ...] = ("\n\n",),
+                 chars_per_token: float = 3.0):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+        self.stop = stop
+        self.chars_per_token = chars_per_token  # Conservative; English averages closer to 4
+
+    @property
+    def num_predict(self) -> int:
+        # Enough tokens to reach max_chars; anything beyond that would be trimmed anyway
+        return int(self.max_chars / self.chars_per_token) + 8
+
+    def options(self, num_predict_cap: Optional[int] = None) -> Dict[str, Any]:
+        num_predict = self.num_predict
+        if num_predict_cap:
+            num_predict = min(num_predict, num_predict_cap)
+        return {'num_predict': num_predict, 'stop': list(self.stop)}
+
+    def trimmer(self, speaker: str = "") -> "StreamTrimmer":
+        return StreamTrimmer(self, speaker)
+
+    def cut_point(self, text: str) -> Optional[int]:
+        """Index where `text` has to end, or None while it is still within the limits."""
+        cut = None
+        content_start = len(text) - len(text.lstrip())
+        for stop in self.stop:
+            index = text.find(stop, content_start)
+            if index > content_start and (cut is None or index < cut):
+                cut = index
+        match = _OTHER_SPEAKER.search(text, content_start)
+        if match and match.start() > content_start and (cut is None or match.start() < cut):
+            cut = match.start()
+
+        ends = 0
+        for match in _SENTENCE_END.finditer(text, 0, cut if cut is not None else len(text)):
+            ends += 1
+            if ends == self.max_sentences:
+                cut = match.end()
+                break
+
+        end = cut if cut is not None else len(text)
+        if len(text[:end].rstrip()) > self.max_chars:
+            # Prefer the last sentence end, then the last word break, within the limit
+            window = text[:self.max_chars + 1]
+            sentence_ends = [m.end() for m in _SENTENCE_END.finditer(window)]
+            if sentence_ends:
+                cut = sentence_ends[-1]
+            else:
+                space = window.rfind(" ")
+                cut = space if space > content_start else self.max_chars
+        return cut
+
+
+class StreamTrimmer:
+    """
+    Applies OutputLimits to a reply as it streams in. feed() returns the part of each
+    chunk that is safe to show; `done` turns True once the limit is reached, at which
+    point the caller should stop reading (and so stop the generation).
+    A leading "Name:" echo of the speaker's own name is dropped.
+    """
+
+    def __init__(self, limits: OutputLimits, speaker: str = ""):
+        self.limits = limits
+        self.prefix = f"{speaker}:".lower() if speaker else ""
+        self.text = ""
+        self.emitted = 0
+        self.done = False
+        self._head = ""  # Held back while it could still be the speaker's name prefix
+        self._strip = False  # Dropping the whitespace after a matched prefix
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        if self.prefix:
+            self._head += chunk
+            head = self._head.lstrip().lower()
+            if len(head) < len(self.prefix) and self.prefix.startswith(head):
+                return ""  # Can't tell yet
+            chunk = self._head
+            if head.startswith(self.prefix):
+                chunk = self._head.lstrip()[len(self.prefix):]
+                self._strip = True
+            self._head = ""
+        self.prefix = None
+
+        if self._strip:
+            # The space after the name can come in a later chunk ("Bob", ":", " Hello")
+            chunk = chunk.lstrip()
+            if not chunk:
+                return ""
+            self._strip = False
+
+        self.text += chunk
+        cut = self.limits.cut_point(self.text)
+        if cut is not None:
+            self.done = True
+            cut = max(cut, self.emitted)  # Text already shown stays shown
+            self.text = self.text[:cut]
+        out = self.text[self.emitted:]
+        self.emitted = len(self.text)
+        return out
+
+    def finish(self) -> str:
+        """Call when the stream ends; releases anything still held back."""
+        if self.prefix and self._head:
+            head, self._head = self._head, ""
+            self.prefix = None
+            return self.feed(head)
+        return ""
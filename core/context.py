@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, List, Dict, Optional
+
+from .history import ConversationHistory, Turn
+
+# (previous_summary, turns_to_fold_in) -> new_summary
+Summarizer = Callable[[str, List[Turn]], str]
+
+# Summaries are generated here so they never block a turn
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class ContextWindow:
+    """
+    Keeps the prompt for a long conversation bounded.
+
+    At least the last keep_last_turns turns are sent verbatim. Older turns are folded
+    into a rolling summary by the summarizer in a background thread; until a summary
+    catches up, evicted turns are simply left out. The whole request (system prompt,
+    opening message, summary and recent turns) is trimmed from the oldest turn down
+    to max_tokens.
+
+    The window slides in steps of summarize_batch turns, and a new summary only shows
+    up when the window moves. Between steps every request for a speaker extends the
+    previous one, which lets Ollama reuse its cached prompt prefix.
+    """
+
+    def __init__(self, keep_last_turns: int = 12, max_tokens: int = 3072,
+                 summarizer: Optional[Summarizer] = None, summarize_batch: int = 4):
+        self.keep_last_turns = keep_last_turns
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summarize_batch = max(1, summarize_batch)
+        self.summary = ""
+        self.summarized_upto = 0  # Number of turns folded into the summary
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._window_start = 0
+        self._shown_summary = ""
+
+    def window_start(self, turn_count: int) -> int:
+        """Index of the first turn sent verbatim."""
+        if turn_count <= self.keep_last_turns:
+            return 0
+        return (turn_count - self.keep_last_turns) // self.summarize_batch * self.summarize_batch
+
+    def build(self, history: ConversationHistory, speaker_name: str, system_prompt: str = "") -> List[Dict[str, str]]:
+        start = self.window_start(len(history))
+        if start != self._window_start:
+            self._window_start = start
+            with self._lock:
+                self._shown_summary = self.summary
+        self._maybe_summarize(history, start)
+
+        view = history.view_for(speaker_name)
+        # view[0] is the opening message, the rest map one-to-one to turns
+        recent = view[1 + start:]
+        head = self._head(view[0])
+
+        budget = self.max_tokens - estimate_tokens(system_prompt) - estimate_tokens(head['content'])
+        kept = []
+        used = 0
+        for message in reversed(recent):
+            cost = estimate_tokens(message['content'])
+            # Always keep the latest message, even if it alone is over budget
+            if kept and used + cost > budget:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+
+        return [head] + kept
+
+    def cancel(self):
+        if self._pending:
+            self._pending.cancel()
+
+    def _head(self, opening: Dict[str, str]) -> Dict[str, str]:
+        if not self._shown_summary:
+            return opening
+        return {'role': 'user', 'content': f"{opening['content']}\n\nSummary of the conversation so far: {self._shown_summary}"}
+
+    def _maybe_summarize(self, history: ConversationHistory, evicted: int):
+        if not self.summarizer or (self._pending and not self._pending.done()):
+            return
+
+        with self._lock:
+            start, previous = self.summarized_upto, self.summary
+        if evicted - start < self.summarize_batch:
+            return
+
+        turns = history.turns[start:evicted]
+        self._pending = _summary_executor.submit(self.summarizer, previous, turns)
+        self._pending.add_done_callback(lambda future: self._finish_summary(future, evicted))
+
+    def _finish_summary(self, future: Future, upto: int):
+        if future.cancelled():
+            return
+        try:
+            summary = future.result()
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            return
+        with self._lock:
+            self.summary = summary
+            self.summarized_upto = upto
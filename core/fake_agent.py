@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import time
+from typing import List, Dict, Iterator, AsyncIterator
+
+from .agent_interface import Agent
+
+_WORDS = (
+    "objection synergy pivot latency banana cloud kernel vibes roadmap hot take "
+    "spreadsheet quarterly blockchain nap sandwich legacy refactor disrupt snack "
+    "deadline coffee paradigm unicorn sprint pixel crayon pager compliance"
+).split()
+
+
+def fake_reply(messages: List[Dict[str, str]], tokens: int = 40) -> List[str]:
+    """
+    Deterministic stand-in for a model reply: the same messages always give the same
+    tokens (words with a trailing space), so runs are repeatable and cacheable.
+    """
+    seed = hashlib.sha256(repr([m['content'] for m in messages[-2:]]).encode('utf-8')).digest()
+    words = [_WORDS[(seed[i % len(seed)] + i) % len(_WORDS)] for i in range(tokens)]
+    words[-1] += "."
+    return [word + " " for word in words]
+
+
+def fake_stats(prompt_tokens: int, eval_tokens: int, first_token_latency: float, tokens_per_sec: float) -> Dict[str, float]:
+    eval_ms = eval_tokens / tokens_per_sec * 1000 if tokens_per_sec else 0.0
+    return {
+        'prompt_eval_count': prompt_tokens,
+        'prompt_eval_ms': first_token_latency * 1000,
+        'eval_count': eval_tokens,
+        'eval_ms': eval_ms,
+        'load_ms': 0.0,
+        'total_ms': first_token_latency * 1000 + eval_ms,
+        'tokens_per_sec': float(tokens_per_sec),
+    }
+
+
+class FakeAgent(Agent):
+    """
+    Agent that needs no model: waits first_token_latency seconds, then emits
+    reply_tokens deterministic tokens at tokens_per_sec. Used by the benchmarks
+    and load tests to measure everything except the LLM itself.
+    """
+
+    def __init__(self, name: str, personality_description: str, tokens_per_sec: float = 50.0,
+                 first_token_latency: float = 0.1, reply_tokens: int = 40):
+        super().__init__(name, personality_description)
+        self.tokens_per_sec = tokens_per_sec
+        self.first_token_latency = first_token_latency
+        self.reply_tokens = reply_tokens
+        self.last_stats: Dict[str, float] = {}
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+
+    def _finish(self, conversation_history: List[Dict[str, str]], tokens: List[str]):
+        prompt_tokens = sum(len(m['content']) for m in conversation_history) // 4
+        self.last_stats = fake_stats(prompt_tokens, len(tokens), self.first_token_latency, self.tokens_per_sec)
+
+    def generate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        return "".join(self.stream_response(conversation_history)).strip()
+
+    def stream_response(self, conversation_history: List[Dict[str, str]]) -> Iterator[str]:
+        tokens = fake_reply(conversation_history, self.reply_tokens)
+        time.sleep(self.first_token_latency)
+        for token in tokens:
+            yield token
+            time.sleep(self._token_delay())
+        self._finish(conversation_history, tokens)
+
+    async def agenerate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        chunks = [chunk async for chunk in self.astream_response(conversation_history)]
+        return "".join(chunks).strip()
+
+    async def astream_response(self, conversation_history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        tokens = fake_reply(conversation_history, self.reply_tokens)
+        await asyncio.sleep(self.first_token_latency)
+        for token in tokens:
+            yield token
+            await asyncio.sleep(self._token_delay())
+        self._finish(conversation_history, tokens)
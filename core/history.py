@@ -0,0 +1,60 @@
+from typing import List, Dict, Iterable, Optional
+
+
+class Turn:
+    """
+    One recorded message. The role-specific message dicts are built once here
+    and shared by every agent's view, so recording a turn never copies the transcript.
+    `meta` holds the turn's timings when the manager recorded them (exported with transcripts).
+    """
+    __slots__ = ("name", "message", "as_assistant", "as_user", "meta")
+
+    def __init__(self, name: str, message: str, meta: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.message = message
+        self.meta = meta
+        self.as_assistant = {'role': 'assistant', 'content': message}
+        self.as_user = {'role': 'user', 'content': f"{name}: {message}"}
+
+
+class ConversationHistory:
+    """
+    Append-only conversation log plus one ready-to-send message view per agent.
+    Each agent sees its own turns as 'assistant' and everyone else's as 'user'
+    ("Name: message"). Views grow by one entry per turn instead of being rebuilt.
+    """
+
+    def __init__(self, topic: str, agent_names: Iterable[str]):
+        self.topic = topic
+        self.turns: List[Turn] = []
+        agent_names = list(dict.fromkeys(agent_names))
+        # Every view starts with the same opening message for its agent, including the
+        # opener, so a speaker's prompt prefix never changes shape between turns
+        self._views: Dict[str, List[Dict[str, str]]] = {
+            name: [{'role': 'user', 'content': self._opening_message(topic, name, agent_names)}]
+            for name in agent_names
+        }
+
+    @staticmethod
+    def _opening_message(topic: str, name: str, agent_names: List[str]) -> str:
+        others = [other for other in agent_names if other != name]
+        if not others:
+            return f"Topic: {topic}"
+        return f"Please discuss the following topic with {', '.join(others)}: {topic}"
+
+    def append(self, name: str, message: str) -> Turn:
+        turn = Turn(name, message)
+        self.turns.append(turn)
+        for agent_name, view in self._views.items():
+            view.append(turn.as_assistant if agent_name == name else turn.as_user)
+        return turn
+
+    def view_for(self, name: str) -> List[Dict[str, str]]:
+        """
+        The message list for the given agent. This is the live list and its dicts are
+        shared between views, so callers must copy rather than mutate it.
+        """
+        return self._views[name]
+
+    def __len__(self) -> int:
+        return len(self.turns)
@@ -1,71 +1,250 @@
-from typing import List, Dict
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, List, Dict, Optional, Tuple
 from .agent_interface import Agent
+from .history import ConversationHistory
+from .context import ContextWindow
+from .turn_policy import TurnPolicy, RoundRobinPolicy
 import time
 
 class ConversationManager:
-    def __init__(self, agent_a: Agent, agent_b: Agent, topic: str):
-        self.agent_a = agent_a
-        self.agent_b = agent_b
+    """
+    Runs a conversation between two or more agents. The first agent opens; after that
+    the turn policy (round-robin by default) picks who speaks. When it picks several
+    agents, their replies are generated concurrently from the same transcript and then
+    handed out one turn per call, in the policy's order.
+    """
+
+    def __init__(self, agents: List[Agent], topic: str, context: Optional[ContextWindow] = None,
+                 policy: Optional[TurnPolicy] = None, prefetch: bool = False, verbose: bool = True,
+                 trace: bool = False, trace_turns: int = 500):
+        if len(agents) < 2:
+            raise ValueError("A conversation needs at least two agents")
+        self.agents = list(agents)
         self.topic = topic
-        self.history_canonical = [] # List of {"name": str, "message": str}
+        self.policy = policy or RoundRobinPolicy()
+        self.history = ConversationHistory(topic, [agent.name for agent in self.agents])
+        self.context = context  # None sends the full transcript every turn
+        self.stop_requested = False  # Callers clear it when they start a new run
+        self._closed = False
+        self.verbose = verbose
+        # Replies already generated (parallel rounds, prefetch) but not yet handed out: (speaker, reply, timings)
+        self._ready: Deque[Tuple[Agent, str, Dict[str, float]]] = deque()
+        # Async API only: generate the next step while the client reads this one
+        self.prefetch = prefetch
+        self._prefetch_task: Optional[asyncio.Task] = None
+        # Async API only: where the last turn spent its time (ms), plus an optional per-turn log
+        self.last_timings: Dict[str, float] = {}
+        self.trace: Optional[Deque[Dict[str, Any]]] = deque(maxlen=trace_turns) if trace else None
 
     def initialize_conversation(self):
         """
-        Initializes the conversation and returns the first message from Agent A.
+        Initializes the conversation and returns the first message, from the first agent.
         """
-        print(f"\n--- Starting Discussion on: '{self.topic}' ---\n")
-        
-        # Initial trigger for Agent A
-        initial_history_for_a = [
-            {'role': 'user', 'content': f"Please discuss the following topic with {self.agent_b.name}: {self.topic}"}
-        ]
-        
-        response_a = self.agent_a.generate_response(initial_history_for_a)
-        self._record_message(self.agent_a, response_a)
-        
-        # Set up state for next turn
-        self.next_speaker = self.agent_b
-        self.other_agent = self.agent_a
-        
-        return self.agent_a, response_a
+        if self.verbose:
+            print(f"\n--- Starting Discussion on: '{self.topic}' ---\n")
+
+        # The opener speaks from its own (still empty) view so later turns extend the same prefix
+        speaker, response, _ = self._generate_one(self.agents[0])
+        return self._complete_turn(speaker, response)
+
+    async def ainitialize_conversation(self):
+        """Async version of initialize_conversation."""
+        if self.verbose:
+            print(f"\n--- Starting Discussion on: '{self.topic}' ---\n")
+
+        started = time.perf_counter()
+        speaker, response, timings = await self._agenerate_one(self.agents[0])
+        result = self._complete_turn(speaker, response)
+        self._record_timings(speaker, timings, started)
+        self._start_prefetch()
+        return result
 
     def next_turn(self):
         """
         Executes a single turn of the conversation.
         Returns (speaker, message) or None if error/done.
         """
-        if not hasattr(self, 'next_speaker'):
+        if not len(self.history) or self.finished:
             return None
 
-        # Build history for current_speaker
-        history_for_llm = [{'role': 'user', 'content': f"Topic: {self.topic}"}]
-        
-        for entry in self.history_canonical:
-            role = 'assistant' if entry['name'] == self.next_speaker.name else 'user'
-            content = entry['message']
-            if role == 'user':
-                content = f"{entry['name']}: {content}"
-            
-            history_for_llm.append({'role': role, 'content': content})
-        
-        # Generate response
-        response = self.next_speaker.generate_response(history_for_llm)
-        self._record_message(self.next_speaker, response)
-        
-        # Return result before swapping
-        result = (self.next_speaker, response)
-        
-        # Swap turns
-        self.next_speaker, self.other_agent = self.other_agent, self.next_speaker
-        
+        if not self._ready:
+            self._ready.extend(self._generate_step())
+        speaker, response, _ = self._ready.popleft()
+        return self._complete_turn(speaker, response)
+
+    async def anext_turn(self):
+        """Async version of next_turn."""
+        if not len(self.history) or self.finished:
+            return None
+
+        started = time.perf_counter()
+        generated_now = False
+        if not self._ready:
+            step = await self._take_prefetched()
+            if step is None:
+                step = await self._agenerate_step()
+                generated_now = True
+            self._ready.extend(step)
+        speaker, response, timings = self._ready.popleft()
+        result = self._complete_turn(speaker, response)
+        self._record_timings(speaker, timings, started, prefetched=not generated_now)
+        self._start_prefetch()
         return result
 
+    async def astream_next_turn(self):
+        """
+        Executes a single turn, yielding (speaker, chunk) as the reply is generated.
+        The full message is recorded once the stream finishes. In a parallel round the
+        first speaker streams while the others generate alongside it.
+        A reply that was already generated (prefetched, or from a parallel round) is yielded as a single chunk.
+        """
+        if not len(self.history) or self.finished:
+            return
+
+        started = time.perf_counter()
+        if not self._ready:
+            step = await self._take_prefetched()
+            if step is not None:
+                self._ready.extend(step)
+        if self._ready:
+            speaker, response, timings = self._ready.popleft()
+            yield speaker, response
+            self._complete_turn(speaker, response)
+            self._record_timings(speaker, timings, started, prefetched=True)
+            self._start_prefetch()
+            return
+
+        speakers = await self.policy.anext_speakers(self.agents, self.history)
+        first, rest = speakers[0], speakers[1:]
+        # The other replies build their histories before the first one is recorded,
+        # so everyone in the round answers the same transcript
+        others = [asyncio.ensure_future(self._agenerate_one(speaker)) for speaker in rest]
+        try:
+            history_for_llm, history_ms = self._timed_history(first)
+            chunks = []
+            async for chunk in first.astream_response(history_for_llm):
+                chunks.append(chunk)
+                yield first, chunk
+            if not chunks:
+                yield first, ""  # Callers still learn who spoke
+            results = await asyncio.gather(*others)
+        finally:
+            for task in others:
+                task.cancel()
+
+        self._ready.extend(results)
+        self._complete_turn(first, "".join(chunks))
+        self._record_timings(first, {'history_ms': history_ms, **(getattr(first, 'last_stats', None) or {})}, started)
+        self._start_prefetch()
+
+    @property
+    def finished(self) -> bool:
+        """True once the turn policy has nothing left to say (e.g. a replayed transcript ran out)."""
+        return not self._ready and self._prefetch_task is None and self.policy.is_finished(self.history)
+
+    def replay(self, turns):
+        """
+        Restores a conversation from recorded (speaker_name, message) pairs
+        without calling the agents, e.g. when loading a stored session.
+        The turn policy picks up from the restored history.
+        """
+        for name, message in turns:
+            self.history.append(name, message)
+
+    def stop(self):
+        """Asks a server-driven run of this conversation to stop after the current turn."""
+        self.stop_requested = True
+        self._cancel_prefetch()
+
+    def close(self):
+        """Drops any background work for this conversation, for good."""
+        self._closed = True
+        self.stop()
+        if self.context:
+            self.context.cancel()
+
+    def _start_prefetch(self):
+        if not self.prefetch or self.stop_requested or self._closed or self._ready or self.finished:
+            return
+        # History can't change until the prefetched step is consumed, so it's safe to start it now
+        self._prefetch_task = asyncio.create_task(self._agenerate_step())
+
+    async def _take_prefetched(self) -> Optional[List[Tuple[Agent, str, Dict[str, float]]]]:
+        task, self._prefetch_task = self._prefetch_task, None
+        if task is None or task.cancelled():
+            return None
+        try:
+            return await task
+        except Exception:
+            # Let the caller retry the generation itself
+            return None
+
+    def _cancel_prefetch(self):
+        task, self._prefetch_task = self._prefetch_task, None
+        if task is None:
+            return
+        if task.done():
+            if not task.cancelled():
+                task.exception()  # Mark any error as retrieved
+        else:
+            task.cancel()
+
+    def _build_history(self, speaker: Agent) -> List[Dict[str, str]]:
+        # The per-speaker view is maintained incrementally by ConversationHistory
+        if self.context is None:
+            return self.history.view_for(speaker.name)
+        return self.context.build(self.history, speaker.name, getattr(speaker, 'system_prompt', ''))
+
+    def _timed_history(self, speaker: Agent) -> Tuple[List[Dict[str, str]], float]:
+        started = time.perf_counter()
+        history_for_llm = self._build_history(speaker)
+        return history_for_llm, (time.perf_counter() - started) * 1000
+
+    def _generate_one(self, speaker: Agent) -> Tuple[Agent, str, Dict[str, float]]:
+        history_for_llm, history_ms = self._timed_history(speaker)
+        response = speaker.generate_response(history_for_llm)
+        return speaker, response, {'history_ms': history_ms, **(getattr(speaker, 'last_stats', None) or {})}
+
+    async def _agenerate_one(self, speaker: Agent) -> Tuple[Agent, str, Dict[str, float]]:
+        history_for_llm, history_ms = self._timed_history(speaker)
+        response = await speaker.agenerate_response(history_for_llm)
+        return speaker, response, {'history_ms': history_ms, **(getattr(speaker, 'last_stats', None) or {})}
+
+    def _generate_step(self) -> List[Tuple[Agent, str, Dict[str, float]]]:
+        speakers = self.policy.next_speakers(self.agents, self.history)
+        if len(speakers) == 1:
+            return [self._generate_one(speakers[0])]
+        # Independent replies: one blocking call per thread, so the round takes one call's time
+        with ThreadPoolExecutor(max_workers=len(speakers)) as pool:
+            return list(pool.map(self._generate_one, speakers))
+
+    async def _agenerate_step(self) -> List[Tuple[Agent, str, Dict[str, float]]]:
+        speakers = await self.policy.anext_speakers(self.agents, self.history)
+        return list(await asyncio.gather(*(self._agenerate_one(speaker) for speaker in speakers)))
+
+    def _record_timings(self, speaker: Agent, timings: Dict[str, float], started: float, prefetched: bool = False):
+        # A prefetched (or buffered) reply was generated earlier, so turn_ms is only what the caller waited
+        timings = {**timings, 'turn_ms': (time.perf_counter() - started) * 1000}
+        if prefetched:
+            timings['prefetched'] = 1.0
+        self.last_timings = timings
+        self.history.turns[-1].meta = timings
+        if self.trace is not None:
+            self.trace.append({'turn': len(self.history), 'speaker': speaker.name, 'timings': timings})
+
+    def _complete_turn(self, speaker: Agent, response: str):
+        self._record_message(speaker, response)
+        return speaker, response
+
     def start_conversation(self, rounds: int = 5):
-        # Legacy method for CLI
+        # Legacy method for CLI: `rounds` messages per agent
         agent, msg = self.initialize_conversation()
         yield (agent, msg)
-        
-        for _ in range(rounds * 2 - 1):
-             yield self.next_turn()
+
+        for _ in range(rounds * len(self.agents) - 1):
+            yield self.next_turn()
+
     def _record_message(self, agent: Agent, message: str):
-        self.history_canonical.append({"name": agent.name, "message": message})
+        self.history.append(agent.name, message)
@@ -0,0 +1,169 @@
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds; the LLM spans land in the upper half
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus-style registry: counters, histograms and callback gauges,
+    rendered in the text exposition format. Updates are a dict lookup and a few
+    additions, so it can stay on in production. Meant to be used from the event
+    loop thread only (no locking).
+    """
+
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._histogram_buckets: Dict[str, Tuple[float, ...]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[LabelKey, float]]] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, {})
+        self._histogram_buckets[name] = tuple(buckets)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], Dict[LabelKey, float]]):
+        """`read` is called at scrape time and returns {label_key: value}."""
+        self._help[name] = ("gauge", help_text)
+        self._gauges[name] = read
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        series = self._counters[name]
+        key = _label_key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        series = self._histograms[name]
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(self._histogram_buckets[name])
+        histogram.observe(value)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, (kind, help_text) in self._help.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for key, value in self._counters[name].items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            elif kind == "gauge":
+                try:
+                    values = self._gauges[name]()
+                except Exception:
+                    values = {}
+                for key, value in values.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            else:
+                for key, histogram in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Turn timings (ms, as produced by ConversationManager / response_stats) -> histogram names
+TURN_SPANS = {
+    "history_ms": "conversation_history_build_seconds",
+    "queue_ms": "ollama_queue_wait_seconds",
+    "first_token_ms": "ollama_first_token_seconds",
+    "prompt_eval_ms": "ollama_prompt_eval_seconds",
+    "eval_ms": "ollama_eval_seconds",
+    "load_ms": "ollama_load_seconds",
+    "serialize_ms": "conversation_serialize_seconds",
+    "total_ms": "ollama_request_seconds",
+    "turn_ms": "conversation_turn_seconds",
+}
+
+
+def create_registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("conversation_turns_total", "Turns completed, by endpoint")
+    registry.counter("conversation_turn_errors_total", "Turns that failed, by endpoint")
+    registry.counter("ollama_cache_hits_total", "Turns answered from the response cache")
+    registry.counter("ollama_truncated_total", "Generations stopped early at the mode's output limits")
+    registry.counter("ollama_prompt_tokens_total", "Prompt tokens evaluated by Ollama")
+    registry.counter("ollama_eval_tokens_total", "Tokens generated by Ollama")
+    registry.histogram("conversation_history_build_seconds", "Time to build the prompt history for a turn")
+    registry.histogram("ollama_queue_wait_seconds", "Time waiting for a generation slot")
+    registry.histogram("ollama_first_token_seconds", "Time from slot to first streamed token")
+    registry.histogram("ollama_prompt_eval_seconds", "Prompt evaluation time reported by Ollama")
+    registry.histogram("ollama_eval_seconds", "Generation time reported by Ollama")
+    registry.histogram("ollama_load_seconds", "Model load time reported by Ollama")
+    registry.histogram("ollama_request_seconds", "Total request time reported by Ollama")
+    registry.histogram("conversation_serialize_seconds", "Time to serialize a turn for the client")
+    registry.histogram("conversation_turn_seconds", "Wall time for a whole turn")
+    registry.histogram("ollama_tokens_per_second", "Generation speed reported by Ollama", RATE_BUCKETS)
+    return registry
+
+
+def record_turn(registry: MetricsRegistry, timings: Dict[str, float], endpoint: str, model: str = ""):
+    """Feeds one turn's timings (see ConversationManager.last_timings) into the registry."""
+    registry.inc("conversation_turns_total", endpoint=endpoint)
+    if timings.get("error"):
+        registry.inc("conversation_turn_errors_total", endpoint=endpoint)
+    if timings.get("cache_hit"):
+        registry.inc("ollama_cache_hits_total", model=model)
+    if timings.get("truncated"):
+        registry.inc("ollama_truncated_total", model=model)
+    for field, name in TURN_SPANS.items():
+        value = timings.get(field)
+        if value is not None:
+            registry.observe(name, value / 1000, model=model)
+    if timings.get("tokens_per_sec"):
+        registry.observe("ollama_tokens_per_second", timings["tokens_per_sec"], model=model)
+    if timings.get("prompt_eval_count"):
+        registry.inc("ollama_prompt_tokens_total", timings["prompt_eval_count"], model=model)
+    if timings.get("eval_count"):
+        registry.inc("ollama_eval_tokens_total", timings["eval_count"], model=model)
+
+
+# Shared by the server process
+metrics = create_registry()
@@ -1,113 +1,342 @@
-import ollama
-from typing import List, Dict
+import asyncio
+import concurrent.futures
+import os
+import time
+from typing import List, Dict, Any, Iterator, AsyncIterator, Optional, Sequence
 from .agent_interface import Agent
+from .concurrency import ModelLimiter, model_limiter
+from .history import Turn
+from .response_cache import ResponseCache, cache_key
+from .prompts import MODE_INSTRUCTIONS, MODE_LIMITS, MODERATOR_PROMPT, CompiledPrompt, prompt_compiler
+from .constraints import OutputLimits, StreamTrimmer
+from .router import ModelRouter, get_router, load_ollama
 
-class OllamaAgent(Agent):
-    MODE_INSTRUCTIONS = {
-        "debate": (
-            "INTERACTION STYLE: FORMAL DEBATE MODE\n"
-            "- Argue like an overcaffeinated lawyer who treats this debate as a historic trial.\n"
-            "- Open with a serious, authoritative claim.\n"
-            "- Escalate into dramatic overconfidence.\n"
-            "- Use legal theatrics like 'Objection!' or 'I rest my case' even when nonsensical.\n"
-            "- Cite obviously fake statistics or studies with absolute certainty.\n"
-            "- Second sentence must be more dramatic or ridiculous than the first."
-        ),
-        "discuss": (
-            "INTERACTION STYLE: FRIENDLY DISCUSSION MODE\n"
-            "- Sound warm, polite, and intellectually generous at first.\n"
-            "- Open by agreeing or praising the idea.\n"
-            "- Gently undermine it with a smarter-sounding counterpoint.\n"
-            "- Use phrases like 'No offense, but…' or 'I love that energy, however…'.\n"
-            "- Deliver the disagreement as casual wisdom, not aggression.\n"
-            "- The punchline should feel like a polite smile hiding a knife."
-        ),
-        "fight": (
-            "INTERACTION STYLE: VERBAL FIGHT MODE - GLOVES ARE OFF\n"
-            "- Start mid-rant as if you’ve already lost patience.\n"
-            "- Use blunt interruptions like 'WRONG.' or 'No. Absolutely not.'\n"
-            "- Exaggerate the opponent’s mistake to an absurd level.\n"
-            "- Bring in a wildly unrelated comparison or grievance.\n"
-            "- Let the tone spiral slightly out of control by the end.\n"
-            "- Second sentence should escalate the chaos."
-        ),
-        "roast": (
-            "INTERACTION STYLE: COMEDY ROAST MODE\n"
-            "- Treat the response like a stand-up roast joke, not a conversation.\n"
-            "- Focus entirely on the idea, not the person.\n"
-            "- Use one strong metaphor or analogy to frame the insult.\n"
-            "- Keep it sharp, concise, and vivid.\n"
-            "- End with a clean punchline that could stand alone.\n"
-            "- If it’s not quotable, rewrite it."
-        )
+DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL", "mistral")
+
+# Sent with every request so the model stays loaded between sessions and the context
+# size never changes (a different num_ctx makes Ollama reload the model and drop its prompt cache)
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+DEFAULT_OPTIONS = {
+    'num_ctx': int(os.environ.get("OLLAMA_NUM_CTX", 4096)),
+    'num_predict': int(os.environ.get("OLLAMA_NUM_PREDICT", 128)),
+}
+# A fixed sampling seed makes generations repeatable, which is what makes cached replies valid
+if os.environ.get("OLLAMA_SEED"):
+    DEFAULT_OPTIONS['seed'] = int(os.environ["OLLAMA_SEED"])
+
+# Enforce each mode's sentence / character limits on the output (OUTPUT_LIMITS=0 turns it off)
+ENFORCE_LIMITS = os.environ.get("OUTPUT_LIMITS", "1") != "0"
+
+def response_stats(response) -> Dict[str, float]:
+    """
+    Token counts and timings from a final Ollama response (Ollama reports durations in ns).
+    prompt_eval covers only the prompt tokens that were not already in the model's cache.
+    """
+    def ms(field):
+        return (response.get(field) or 0) / 1e6
+
+    stats = {
+        'prompt_eval_count': response.get('prompt_eval_count') or 0,
+        'prompt_eval_ms': ms('prompt_eval_duration'),
+        'eval_count': response.get('eval_count') or 0,
+        'eval_ms': ms('eval_duration'),
+        'load_ms': ms('load_duration'),
+        'total_ms': ms('total_duration'),
     }
+    stats['tokens_per_sec'] = stats['eval_count'] / (stats['eval_ms'] / 1000) if stats['eval_ms'] else 0.0
+    return stats
+
+
+class OllamaAgent(Agent):
+    MODE_INSTRUCTIONS = MODE_INSTRUCTIONS
     
-    def __init__(self, name: str, personality_description: str, model_name: str = "mistral", mode: str = "debate"):
+    def __init__(self, name: str, personality_description: str, model_name: str = DEFAULT_MODEL, mode: str = "debate",
+                 keep_alive: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                 cache: Optional[ResponseCache] = None, limits: Optional[OutputLimits] = None,
+                 prompt: Optional[CompiledPrompt] = None, participants: Sequence[str] = ()):
         super().__init__(name, personality_description)
         self.model_name = model_name
         self.mode = mode
-        mode_instruction = self.MODE_INSTRUCTIONS.get(mode, self.MODE_INSTRUCTIONS["debate"])
-        
-        self.system_prompt = (
-            f"You are {name}, one speaker in a two-person comedic-educational exchange.\n\n"
-            f"{personality_description}\n\n"
-            f"{mode_instruction}\n\n"
-            "PRIMARY GOAL:\n"
-            "• Be hilarious, use jokes and puns AND teach exactly one real insight per turn.\n\n"
-            "• Use simple language, avoid complex vocabulary.\n"
-            "• Use short sentences, avoid long complex sentences.\n"
-            "• Respond as a stand-alone hot take that could be quoted independently.\n"
-            "HARD OUTPUT LIMITS (CRITICAL):\n"
-            "• MAXIMUM 2 sentences.\n"
-            "• MAXIMUM 280 characters TOTAL.\n"
-            "• Each sentence must be ≤ 20 words.\n\n"
-            "STRUCTURAL RESTRICTIONS:\n"
-            "• No compound sentences.\n"
-            "• No semicolons, em dashes, parentheses, or lists.\n"
-            "• No multi-clause sentences.\n\n"
-            "SPEAKER LOCK:\n"
-            "• Exactly ONE chat bubble.\n"
-            "• First-person voice only.\n"
-            "• Do NOT simulate or write the other speaker.\n\n"
-            "STYLE RULES:\n"
-            "• Stay in character.\n"
-            "• Comedy first, insight second.\n"
-            "• End with a punchline.\n\n"
-            "MANDATORY SELF-CHECK BEFORE OUTPUT:\n"
-            "• Count sentences and characters.\n"
-            "• If limits are exceeded, rewrite shorter.\n"
-            "• Output ONLY the final compliant text.\n\n"
-            "If ANY rule is violated, the response is INVALID."
-            "ANTI-REPETITION RULE:\n"
-            "- Do NOT reuse metaphors, examples, jokes, or punchlines from the previous speaker.\n"
-            "- Do NOT mirror sentence structure or phrasing.\n"
-            "- Introduce at least ONE new angle, example, or analogy per turn.\n"
-        )
+        self.keep_alive = KEEP_ALIVE if keep_alive is None else keep_alive
+        if limits is None and ENFORCE_LIMITS:
+            limits = MODE_LIMITS.get(mode, MODE_LIMITS["debate"])
+        self.limits = limits  # None leaves the output untouched
+        limit_options = limits.options(DEFAULT_OPTIONS['num_predict']) if limits else {}
+        self.options = {**DEFAULT_OPTIONS, **limit_options, **(options or {})}
+        self.cache = cache
+        self.last_stats: Dict[str, float] = {}  # Timings of the most recent call
+        # Built once per (personality, mode, model, panel) and shared across agents and sessions
+        self.prompt = prompt or prompt_compiler.compile(name, personality_description, mode, model_name, participants)
 
-    def generate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+    @property
+    def system_prompt(self) -> str:
+        return self.prompt.text
+
+    @property
+    def system_prompt_hash(self) -> str:
+        return self.prompt.hash
+
+    def _build_messages(self, conversation_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
         # Construct the messages list for Ollama
         # We start with the system prompt
-        messages = [{'role': 'system', 'content': self.system_prompt}]
+        messages = [self.prompt.message]
         
         # Add the conversation history
-        # We need to map the history format to what Ollama expects (role, content)
-        # Assuming the manager passes history as we want it, or we adapt it here.
-        # Ideally, the history passed in contains messages from 'user' (the other agent) and 'assistant' (self).
-        # However, since we have two agents, 'user' for one is 'assistant' for the other.
-        # It's cleaner if the Manager handles the "who said what" and passes a list of "Speaker Name: Message".
-        # BUT, for LLM API, it wants specific roles.
-        
-        # Better approach:
-        # The manager maintains a canonical history.
-        # When calling Agent A, Agent A sees itself as 'assistant' and Agent B as 'user'.
+        # The manager maintains a canonical history and maps it per speaker:
+        # when calling Agent A, Agent A sees itself as 'assistant' and Agent B as 'user'.
         messages.extend(conversation_history)
+        return messages
+
+    def _chat_kwargs(self, conversation_history: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        return {
+            'model': self.model_name,
+            'messages': self._build_messages(conversation_history),
+            'options': self.options,
+            'keep_alive': self.keep_alive,
+            'stream': stream,
+        }
+
+    def _cache_key(self, conversation_history: List[Dict[str, str]]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return cache_key(self.model_name, self.system_prompt_hash, self.options, conversation_history)
+
+    def _cache_hit(self, cached: Optional[str]) -> Optional[str]:
+        if cached is not None:
+            self.last_stats = {'cache_hit': 1.0}
+        return cached
+
+    def _cache_lookup(self, conversation_history: List[Dict[str, str]]):
+        """Returns (key, cached_reply); both are None when caching is off."""
+        key = self._cache_key(conversation_history)
+        if key is None:
+            return None, None
+        return key, self._cache_hit(self.cache.get(key))
+
+    def _cache_store(self, key: Optional[str], reply: str):
+        if key is not None:
+            self.cache.put(key, reply)
 
+    def _reply(self, timings: Optional[Dict[str, float]] = None) -> "ReplyStream":
+        return ReplyStream(self, self.limits.trimmer(self.name) if self.limits else None, timings)
+
+    def _error_reply(self, error: Exception) -> str:
+        # Failed calls come back as text; callers that need to know check the 'error' stat
+        self.last_stats = {**self.last_stats, 'error': 1.0}
+        return f"[Error calling Ollama: {str(error)}]"
+
+    def generate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        # Streams internally so a reply that hits the output limit stops generating right away
+        return "".join(self.stream_response(conversation_history))
+
+    def stream_response(self, conversation_history: List[Dict[str, str]]) -> Iterator[str]:
+        key, cached = self._cache_lookup(conversation_history)
+        if cached is not None:
+            yield cached
+            return
+
+        reply = self._reply()
         try:
-            response = ollama.chat(
-                model=self.model_name, 
-                messages=messages,
-                # options={'num_predict': 80}  # Limit to ~80 tokens for short responses
-            )
-            return response['message']['content']
+            stream = load_ollama().chat(**self._chat_kwargs(conversation_history, stream=True))
+            try:
+                for chunk in stream:
+                    content = reply.feed(chunk)
+                    if content:
+                        yield content
+                    if reply.done:
+                        break
+                tail = reply.finish()
+                if tail:
+                    yield tail
+            finally:
+                if hasattr(stream, 'close'):
+                    stream.close()
+            self._cache_store(key, reply.text)
         except Exception as e:
-            return f"[Error calling Ollama: {str(e)}]"
+            yield self._error_reply(e)
+
+
+class ReplyStream:
+    """
+    Chunk handling shared by OllamaAgent's sync and async streaming paths: applies the
+    output limits, collects the reply and keeps the agent's last_stats current (plus
+    first_token_ms in `timings`). Once `done` is set the caller should close the
+    response: closing it early is what stops the generation on the Ollama server.
+    """
+
+    def __init__(self, agent: "OllamaAgent", trimmer: Optional[StreamTrimmer],
+                 timings: Optional[Dict[str, float]] = None):
+        self.agent = agent
+        self.trimmer = trimmer
+        self.timings = {} if timings is None else timings
+        self.started = time.perf_counter()
+        self.chunks: List[str] = []
+        self.read = 0
+        agent.last_stats = self.timings
+
+    @property
+    def done(self) -> bool:
+        return bool(self.trimmer and self.trimmer.done)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, chunk) -> str:
+        """Returns the part of an Ollama chunk to pass on (may be empty)."""
+        self.read += 1
+        content = chunk['message']['content']
+        if content and 'first_token_ms' not in self.timings:
+            self.timings['first_token_ms'] = (time.perf_counter() - self.started) * 1000
+        if chunk.get('done'):
+            self.agent.last_stats = {**response_stats(chunk), **self.timings}
+        if self.trimmer:
+            content = self.trimmer.feed(content)
+        if content:
+            self.chunks.append(content)
+        if self.done:
+            # Stopped before Ollama's final chunk, so only the token count is known
+            self.agent.last_stats = {'eval_count': self.read, 'truncated': 1.0, **self.timings}
+        return content
+
+    def finish(self) -> str:
+        """Call when the stream ends; returns anything the trimmer still held back."""
+        tail = self.trimmer.finish() if self.trimmer else ""
+        if tail:
+            self.chunks.append(tail)
+        return tail
+
+
+class OllamaSummarizer:
+    """
+    Folds turns that fell out of the context window into a short running summary.
+    Called from the context window's worker thread. Once bind() has given it the
+    server's event loop, the request goes through the model limiter and the router
+    (so it takes a generation slot and fails over like any turn); unbound (the CLI)
+    it calls Ollama directly.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_tokens: int = 150, timeout: float = 120.0,
+                 limiter: Optional[ModelLimiter] = None, router: Optional[ModelRouter] = None):
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.limiter = limiter or model_limiter
+        self.router = router
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def _chat_kwargs(self, previous_summary: str, turns: List[Turn]) -> Dict[str, Any]:
+        transcript = "\n".join(f"{turn.name}: {turn.message}" for turn in turns)
+        prompt = (
+            "Update the running summary of a conversation with the new lines below.\n"
+            "Keep every speaker's main claims and running jokes. Maximum 5 sentences.\n\n"
+            f"CURRENT SUMMARY:\n{previous_summary or '(none)'}\n\n"
+            f"NEW LINES:\n{transcript}\n\n"
+            "Output ONLY the updated summary."
+        )
+        return {
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'options': {**DEFAULT_OPTIONS, 'num_predict': self.max_tokens},
+            'keep_alive': KEEP_ALIVE,
+        }
+
+    async def asummarize(self, previous_summary: str, turns: List[Turn]) -> str:
+        async with self.limiter.slot(self.model_name, "summary"):
+            response = await (self.router or get_router()).chat(**self._chat_kwargs(previous_summary, turns))
+        return response['message']['content'].strip()
+
+    def __call__(self, previous_summary: str, turns: List[Turn]) -> str:
+        if self.loop is not None and self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self.asummarize(previous_summary, turns), self.loop)
+            try:
+                return future.result(self.timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise
+        response = load_ollama().chat(**self._chat_kwargs(previous_summary, turns))
+        return response['message']['content'].strip()
+
+
+class AsyncOllamaAgent(OllamaAgent):
+    """
+    OllamaAgent with a non-blocking path for the server.
+    Calls wait for a slot in the per-model limiter, then go through the model router
+    (pooled connections to one or more Ollama endpoints, with failover).
+    `session_key` lets the batch scheduler share slots fairly between sessions.
+    last_stats also records queue_ms (slot wait) and, when streaming, first_token_ms.
+    The sync methods are inherited unchanged for the CLI.
+    """
+
+    def __init__(self, name: str, personality_description: str, model_name: str = DEFAULT_MODEL,
+                 mode: str = "debate", keep_alive: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                 cache: Optional[ResponseCache] = None, limiter: Optional[ModelLimiter] = None,
+                 router: Optional[ModelRouter] = None, session_key: Optional[str] = None,
+                 prompt: Optional[CompiledPrompt] = None, participants: Sequence[str] = ()):
+        super().__init__(name, personality_description, model_name=model_name, mode=mode,
+                         keep_alive=keep_alive, options=options, cache=cache, prompt=prompt,
+                         participants=participants)
+        self.limiter = limiter or model_limiter
+        self.session_key = session_key
+        self.router = router or get_router()
+
+    async def _acache_lookup(self, conversation_history: List[Dict[str, str]]):
+        # A disk-backed cache is read in a thread, not on the event loop
+        key = self._cache_key(conversation_history)
+        if key is None:
+            return None, None
+        return key, self._cache_hit(await self.cache.aget(key))
+
+    async def _acache_store(self, key: Optional[str], reply: str):
+        if key is not None:
+            await self.cache.aput(key, reply)
+
+    async def agenerate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        return "".join([chunk async for chunk in self.astream_response(conversation_history)])
+
+    async def astream_response(self, conversation_history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        # Cache hits don't wait for a generation slot
+        key, cached = await self._acache_lookup(conversation_history)
+        if cached is not None:
+            yield cached
+            return
+
+        queued = time.perf_counter()
+        async with self.limiter.slot(self.model_name, self.session_key):
+            reply = self._reply({'queue_ms': (time.perf_counter() - queued) * 1000})
+            try:
+                stream = self.router.stream_chat(**self._chat_kwargs(conversation_history, stream=True))
+                try:
+                    async for chunk in stream:
+                        content = reply.feed(chunk)
+                        if content:
+                            yield content
+                        if reply.done:
+                            break
+                    tail = reply.finish()
+                    if tail:
+                        yield tail
+                finally:
+                    await stream.aclose()
+                await self._acache_store(key, reply.text)
+            except Exception as e:
+                yield self._error_reply(e)
+
+
+class ModeratorAgent(AsyncOllamaAgent):
+    """
+    The agent ModeratorPolicy asks who speaks next. It only has to name a participant,
+    so it gets its own short neutral system prompt instead of a persona, a small token
+    budget, no output limits or trimming (which would cut at the speaker prefix), no
+    response cache and no session key. Works sync (CLI) and async (server).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_tokens: int = 16,
+                 limiter: Optional[ModelLimiter] = None, router: Optional[ModelRouter] = None):
+        super().__init__("Moderator", "", model_name=model_name, limiter=limiter, router=router,
+                         prompt=CompiledPrompt(MODERATOR_PROMPT, model_name, "moderator"))
+        self.limits = None
+        self.options = {**DEFAULT_OPTIONS, 'num_predict': max_tokens}
@@ -0,0 +1,42 @@
+import json
+from typing import Dict, Optional, Tuple
+
+from .response_cache import DiskResponseCache
+
+
+class PersonaCache:
+    """
+    Generated personas keyed by the SHA-256 of the uploaded file, so re-uploading the
+    same resume or bio skips extraction and generation. Backed by the same SQLite LRU
+    as the response cache, capped at max_entries personas on disk.
+    """
+
+    def __init__(self, path: str, max_entries: int = 256):
+        self._cache = DiskResponseCache(path, max_entries=max_entries, max_disk_entries=max_entries)
+
+    def get(self, content_hash: str) -> Optional[Tuple[str, str]]:
+        return self._decode(self._cache.get(content_hash))
+
+    def put(self, content_hash: str, name: str, description: str):
+        self._cache.put(content_hash, self._encode(name, description))
+
+    # For the server: the SQLite file is read and written in a thread
+    async def aget(self, content_hash: str) -> Optional[Tuple[str, str]]:
+        return self._decode(await self._cache.aget(content_hash))
+
+    async def aput(self, content_hash: str, name: str, description: str):
+        await self._cache.aput(content_hash, self._encode(name, description))
+
+    @staticmethod
+    def _encode(name: str, description: str) -> str:
+        return json.dumps({"name": name, "description": description})
+
+    @staticmethod
+    def _decode(value: Optional[str]) -> Optional[Tuple[str, str]]:
+        if value is None:
+            return None
+        persona = json.loads(value)
+        return persona["name"], persona["description"]
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
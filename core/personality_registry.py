@@ -0,0 +1,100 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .personality_loader import Personality, load_personalities
+
+
+class PersonalityRegistry:
+    """
+    Name-indexed view over the built-in personalities on disk plus custom ones added at runtime.
+
+    The directory is rescanned (at most every check_interval seconds) when a file is added,
+    removed or modified, so new personas show up without a restart. The listing served by
+    the API is serialized once per change, with an ETag for conditional requests.
+    At most max_custom custom personalities are kept; the oldest are dropped first.
+    """
+
+    def __init__(self, directory: str, check_interval: float = 2.0, max_custom: int = 50):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.max_custom = max_custom
+        self._base: Dict[str, Personality] = {}
+        self._custom: "OrderedDict[str, Personality]" = OrderedDict()
+        self._index: Dict[str, Personality] = {}
+        self._signature: Tuple = ()
+        self._next_check = 0.0
+        self._listing: Optional[Tuple[bytes, str]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """(Re)loads the personality files. Returns how many were found."""
+        with self._lock:
+            self._reload()
+            return len(self._base)
+
+    def get(self, name: str) -> Optional[Personality]:
+        self._refresh_if_changed()
+        return self._index.get(name)
+
+    def builtin(self) -> List[Personality]:
+        """The personalities loaded from disk, without custom ones."""
+        return list(self._base.values())
+
+    def add_custom(self, personality: Personality):
+        with self._lock:
+            self._custom[personality.name] = personality
+            self._custom.move_to_end(personality.name)
+            while len(self._custom) > self.max_custom:
+                self._custom.popitem(last=False)
+            self._rebuild_index()
+
+    def listing(self) -> Tuple[bytes, str]:
+        """JSON body for GET /api/personalities and its ETag, cached until something changes."""
+        self._refresh_if_changed()
+        with self._lock:
+            if self._listing is None:
+                body = json.dumps([
+                    {"name": p.name, "description": p.behavior_description}
+                    for p in sorted(self._index.values(), key=lambda p: p.name.lower())
+                ]).encode('utf-8')
+                self._listing = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+            return self._listing
+
+    def _files_signature(self) -> Tuple:
+        files = glob.glob(os.path.join(self.directory, "*.md")) + glob.glob(os.path.join(self.directory, "*.txt"))
+        signature = []
+        for filepath in sorted(files):
+            try:
+                signature.append((filepath, os.stat(filepath).st_mtime_ns))
+            except OSError:
+                continue
+        return tuple(signature)
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            if self._files_signature() != self._signature:
+                self._reload()
+                print(f"Reloaded {len(self._base)} built-in personalities.")
+
+    def _reload(self):
+        self._signature = self._files_signature()
+        self._next_check = time.monotonic() + self.check_interval
+        self._base = {p.name: p for p in load_personalities(self.directory)}
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        # Custom personalities shadow built-in ones with the same name
+        self._index = {**self._base, **self._custom}
+        self._listing = None
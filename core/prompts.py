@@ -0,0 +1,170 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+from .constraints import OutputLimits
+from .response_cache import prompt_hash
+
+MODE_INSTRUCTIONS = {
+    "debate": (
+        "INTERACTION STYLE: FORMAL DEBATE MODE\n"
+        "- Argue like an overcaffeinated lawyer who treats this debate as a historic trial.\n"
+        "- Open with a serious, authoritative claim.\n"
+        "- Escalate into dramatic overconfidence.\n"
+        "- Use legal theatrics like 'Objection!' or 'I rest my case' even when nonsensical.\n"
+        "- Cite obviously fake statistics or studies with absolute certainty.\n"
+        "- Second sentence must be more dramatic or ridiculous than the first."
+    ),
+    "discuss": (
+        "INTERACTION STYLE: FRIENDLY DISCUSSION MODE\n"
+        "- Sound warm, polite, and intellectually generous at first.\n"
+        "- Open by agreeing or praising the idea.\n"
+        "- Gently undermine it with a smarter-sounding counterpoint.\n"
+        "- Use phrases like 'No offense, but…' or 'I love that energy, however…'.\n"
+        "- Deliver the disagreement as casual wisdom, not aggression.\n"
+        "- The punchline should feel like a polite smile hiding a knife."
+    ),
+    "fight": (
+        "INTERACTION STYLE: VERBAL FIGHT MODE - GLOVES ARE OFF\n"
+        "- Start mid-rant as if you’ve already lost patience.\n"
+        "- Use blunt interruptions like 'WRONG.' or 'No. Absolutely not.'\n"
+        "- Exaggerate the opponent’s mistake to an absurd level.\n"
+        "- Bring in a wildly unrelated comparison or grievance.\n"
+        "- Let the tone spiral slightly out of control by the end.\n"
+        "- Second sentence should escalate the chaos."
+    ),
+    "roast": (
+        "INTERACTION STYLE: COMEDY ROAST MODE\n"
+        "- Treat the response like a stand-up roast joke, not a conversation.\n"
+        "- Focus entirely on the idea, not the person.\n"
+        "- Use one strong metaphor or analogy to frame the insult.\n"
+        "- Keep it sharp, concise, and vivid.\n"
+        "- End with a clean punchline that could stand alone.\n"
+        "- If it’s not quotable, rewrite it."
+    )
+}
+
+
+# The hard limits the prompt asks for; OllamaAgent also enforces them on the output
+MODE_LIMITS = {mode: OutputLimits(max_sentences=2, max_chars=280) for mode in MODE_INSTRUCTIONS}
+
+
+def build_system_prompt(name: str, personality_description: str, mode: str, others: Sequence[str] = ()) -> str:
+    """`others` names the other speakers of a panel; leave it empty for a two-person exchange."""
+    mode_instruction = MODE_INSTRUCTIONS.get(mode, MODE_INSTRUCTIONS["debate"])
+    limits = MODE_LIMITS.get(mode, MODE_LIMITS["debate"])
+    if others:
+        setting = (f"one of {len(others) + 1} speakers in a comedic-educational panel "
+                   f"with {', '.join(others)}")
+        earlier, other_speaker = "any earlier speaker", "any other speaker"
+    else:
+        setting = "one speaker in a two-person comedic-educational exchange"
+        earlier, other_speaker = "the previous speaker", "the other speaker"
+
+    return (
+        f"You are {name}, {setting}.\n\n"
+        f"{personality_description}\n\n"
+        f"{mode_instruction}\n\n"
+        "PRIMARY GOAL:\n"
+        "• Be hilarious, use jokes and puns AND teach exactly one real insight per turn.\n\n"
+        "• Use simple language, avoid complex vocabulary.\n"
+        "• Use short sentences, avoid long complex sentences.\n"
+        "• Respond as a stand-alone hot take that could be quoted independently.\n"
+        "HARD OUTPUT LIMITS (CRITICAL):\n"
+        f"• MAXIMUM {limits.max_sentences} sentences.\n"
+        f"• MAXIMUM {limits.max_chars} characters TOTAL.\n"
+        "• Each sentence must be ≤ 20 words.\n\n"
+        "STRUCTURAL RESTRICTIONS:\n"
+        "• No compound sentences.\n"
+        "• No semicolons, em dashes, parentheses, or lists.\n"
+        "• No multi-clause sentences.\n\n"
+        "SPEAKER LOCK:\n"
+        "• Exactly ONE chat bubble.\n"
+        "• First-person voice only.\n"
+        f"• Do NOT simulate or write {other_speaker}.\n\n"
+        "STYLE RULES:\n"
+        "• Stay in character.\n"
+        "• Comedy first, insight second.\n"
+        "• End with a punchline.\n\n"
+        "MANDATORY SELF-CHECK BEFORE OUTPUT:\n"
+        "• Count sentences and characters.\n"
+        "• If limits are exceeded, rewrite shorter.\n"
+        "• Output ONLY the final compliant text.\n\n"
+        "If ANY rule is violated, the response is INVALID."
+        "ANTI-REPETITION RULE:\n"
+        f"- Do NOT reuse metaphors, examples, jokes, or punchlines from {earlier}.\n"
+        "- Do NOT mirror sentence structure or phrasing.\n"
+        "- Introduce at least ONE new angle, example, or analogy per turn.\n"
+    )
+
+
+# System prompt of the ModeratorPolicy's speaker picker (see ModeratorAgent)
+MODERATOR_PROMPT = (
+    "You are the neutral moderator of a lively panel conversation. You never take part in it.\n"
+    "Given the topic, the recent lines and the participants, pick who should speak next: "
+    "someone who was challenged, has the most to add, or has been quiet for a while.\n"
+    "Answer with exactly one participant name and nothing else."
+)
+
+
+class CompiledPrompt:
+    """
+    A system prompt built once and shared by every agent (and session) that uses it.
+    `hash` is a stable content hash for response caching and prompt-cache warm-up.
+    """
+    __slots__ = ("text", "hash", "message", "model", "mode")
+
+    def __init__(self, text: str, model: str, mode: str):
+        self.text = sys.intern(text)
+        self.hash = prompt_hash(text)
+        self.message = {'role': 'system', 'content': self.text}  # Shared, never mutate
+        self.model = model
+        self.mode = mode
+
+
+class PromptCompiler:
+    """
+    Builds each (personality, mode, model, participants) system prompt once and keeps the
+    most recent ones. Two-person sessions share one prompt per personality whoever the
+    partner is, so warm-up and the response cache cover them; panels of three or more
+    name everyone else.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._prompts: "OrderedDict[Tuple[str, str, str, str, Tuple[str, ...]], CompiledPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.compiled = 0
+
+    def compile(self, name: str, personality_description: str, mode: str, model: str,
+                participants: Sequence[str] = ()) -> CompiledPrompt:
+        """`participants` are the names of everyone in the session (the speaker included)."""
+        if mode not in MODE_INSTRUCTIONS:
+            mode = "debate"
+        others = tuple(p for p in participants if p != name)
+        if len(others) < 2:
+            others = ()
+        key = (name, personality_description, mode, model, others)
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is not None:
+                self._prompts.move_to_end(key)
+                return prompt
+
+        prompt = CompiledPrompt(build_system_prompt(name, personality_description, mode, others), model, mode)
+        with self._lock:
+            prompt = self._prompts.setdefault(key, prompt)
+            self._prompts.move_to_end(key)
+            self.compiled += 1
+            while len(self._prompts) > self.max_entries:
+                self._prompts.popitem(last=False)
+        return prompt
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"prompts": len(self._prompts), "compiled": self.compiled}
+
+
+# Shared by every agent in the process
+prompt_compiler = PromptCompiler()
@@ -0,0 +1,72 @@
+import re
+from typing import Any, AsyncIterator, Dict, Iterator, List
+from .agent_interface import Agent
+from .history import ConversationHistory
+from .manager import ConversationManager
+from .turn_policy import TurnPolicy
+
+# Word-sized chunks, so a replayed turn streams like a generated one
+_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+class ReplayAgent(Agent):
+    """
+    Plays back one speaker's recorded messages instead of calling a model.
+    The k-th reply is the k-th recorded message, where k is the number of this agent's
+    own (assistant) turns in the history it is given, so it needs no state of its own
+    and picks up correctly after ConversationManager.replay().
+    """
+
+    def __init__(self, name: str, personality_description: str, messages: List[str]):
+        super().__init__(name, personality_description)
+        self.messages = messages
+        self.last_stats: Dict[str, float] = {}
+
+    def generate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        spoken = sum(1 for message in conversation_history if message['role'] == 'assistant')
+        self.last_stats = {'replayed': 1.0}
+        return self.messages[spoken] if spoken < len(self.messages) else ""
+
+    def stream_response(self, conversation_history: List[Dict[str, str]]) -> Iterator[str]:
+        yield from _CHUNK.findall(self.generate_response(conversation_history))
+
+    async def agenerate_response(self, conversation_history: List[Dict[str, str]]) -> str:
+        return self.generate_response(conversation_history)
+
+    async def astream_response(self, conversation_history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        for chunk in self.stream_response(conversation_history):
+            yield chunk
+
+
+class ScriptedPolicy(TurnPolicy):
+    """Speakers follow the recorded order; the conversation ends with the recording."""
+    name = "replay"
+
+    def __init__(self, speakers: List[str]):
+        self.speakers = speakers
+
+    def next_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        name = self.speakers[len(history)]
+        return [agent for agent in agents if agent.name == name]
+
+    def is_finished(self, history: ConversationHistory) -> bool:
+        return len(history) >= len(self.speakers)
+
+
+def build_replay_manager(header: Dict[str, Any], turns: List[Dict[str, Any]],
+                         trace: bool = False, verbose: bool = False) -> ConversationManager:
+    """A ConversationManager that serves a recorded transcript through the normal turn API."""
+    speakers = [turn["speaker"] for turn in turns]
+    descriptions = {agent["name"]: agent.get("description", "") for agent in header["agents"]}
+    # The recorded opener has to be first, since the manager always lets agents[0] open
+    names = [speakers[0]] + [name for name in descriptions if name != speakers[0]]
+    agents = [
+        ReplayAgent(name, descriptions.get(name, ""), [turn["message"] for turn in turns if turn["speaker"] == name])
+        for name in names
+    ]
+    if len(agents) < 2:
+        # A monologue still needs a second seat; it never gets a turn
+        agents.append(ReplayAgent("Audience", "", []))
+    # No context window: ReplayAgent counts its turns from the full per-agent view
+    return ConversationManager(agents, header.get("topic", ""), policy=ScriptedPolicy(speakers),
+                               trace=trace, verbose=verbose)
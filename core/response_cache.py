@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def prompt_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def cache_key(model: str, system_prompt_hash: str, options: Dict[str, Any], history: List[Dict[str, str]]) -> str:
+    """Content address of one generation request."""
+    payload = json.dumps([model, system_prompt_hash, options, history], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache of generated replies, keyed by cache_key.
+    Only worth enabling alongside a fixed sampling seed (OLLAMA_SEED), otherwise
+    a hit replays one of many possible replies rather than the deterministic one.
+    """
+
+    persistent = False  # True when _load/_store do I/O, which the async methods run in a thread
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        return self._loaded(key, self._load(key))
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._remember(key, value)
+        self._store(key, value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop: a memory hit answers inline, the disk tier runs in a thread."""
+        value = self._get_memory(key)
+        if value is not None or not self.persistent:
+            return value if value is not None else self._loaded(key, None)
+        return self._loaded(key, await asyncio.to_thread(self._load, key))
+
+    async def aput(self, key: str, value: str):
+        with self._lock:
+            self._remember(key, value)
+        if self.persistent:
+            await asyncio.to_thread(self._store, key, value)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _loaded(self, key: str, value: Optional[str]) -> Optional[str]:
+        # Counts a memory miss and keeps whatever the second tier found
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, value)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _remember(self, key: str, value: str):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Second-tier hooks for persistent backends
+    def _load(self, key: str) -> Optional[str]:
+        return None
+
+    def _store(self, key: str, value: str):
+        pass
+
+
+class DiskResponseCache(ResponseCache):
+    """
+    ResponseCache backed by a SQLite file, so cached replies survive restarts
+    and are shared by worker processes. The file keeps about max_disk_entries
+    rows: the row count is only checked every `check_every` writes (it's a table
+    scan), and once over the limit the least recently used rows are dropped in one
+    batch down to `low_water` of it, so most writes are a single indexed insert.
+    """
+    persistent = True
+
+    def __init__(self, path: str, max_entries: int = 1024, max_disk_entries: int = 100_000,
+                 low_water: float = 0.9):
+        super().__init__(max_entries)
+        self.max_disk_entries = max_disk_entries
+        self.low_water = low_water
+        self.check_every = max(1, max_disk_entries // 100)
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db_lock = threading.Lock()
+        self._trim()  # The limit may have been lowered since the file was written
+
+    def _load(self, key: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def _store(self, key: str, value: str):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, last_used) VALUES (?, ?, ?)", (key, value, time.time())
+            )
+            self._writes += 1
+        if self._writes % self.check_every == 0:
+            self._trim()
+
+    def _trim(self):
+        with self._db_lock:
+            count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_disk_entries:
+                keep = int(self.max_disk_entries * self.low_water)
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (count - keep,)
+                )
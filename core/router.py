@@ -0,0 +1,185 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+
+def load_ollama():
+    """
+    Imports the ollama client on first use. It pulls in httpx and takes a good part of a
+    second, which the CLI shouldn't pay before it needs a model (the server pays it during warm-up).
+    """
+    import ollama
+    return ollama
+
+
+class Endpoint:
+    """One Ollama instance with its own pooled keep-alive connections."""
+
+    def __init__(self, host: str, max_connections: int = 16):
+        self.host = host
+        self.max_connections = max_connections
+        self._client = None
+        self.healthy = True
+        self.outstanding = 0
+        self.loaded_models: Set[str] = set()
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = load_ollama().AsyncClient(
+                host=self.host,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def mark_down(self, error: Exception):
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error)
+
+
+class ModelRouter:
+    """
+    Spreads generations over several Ollama endpoints.
+
+    Requests go to a healthy endpoint that already has the model loaded, breaking ties
+    by fewest outstanding requests. If an endpoint can't be reached it is marked down
+    and the request fails over to the next candidate; a background health check
+    (/api/ps) brings endpoints back and refreshes which models they have loaded.
+    """
+
+    def __init__(self, hosts: List[str], max_connections: int = 16, health_interval: float = 10.0):
+        self.endpoints = [Endpoint(host, max_connections) for host in hosts]
+        self.health_interval = health_interval
+        self._health_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """OLLAMA_HOSTS is a comma-separated list; it falls back to OLLAMA_HOST, then Ollama's default."""
+        hosts = os.environ.get("OLLAMA_HOSTS") or os.environ.get("OLLAMA_HOST") or "http://127.0.0.1:11434"
+        return cls(
+            [host.strip() for host in hosts.split(",") if host.strip()],
+            max_connections=int(os.environ.get("OLLAMA_MAX_CONNECTIONS", 16)),
+            health_interval=float(os.environ.get("OLLAMA_HEALTH_INTERVAL", 10)),
+        )
+
+    def serving_endpoints(self) -> int:
+        """How many endpoints take requests: the healthy ones, or all of them when none is (see candidates)."""
+        return sum(1 for e in self.endpoints if e.healthy) or len(self.endpoints)
+
+    def candidates(self, model: str) -> List[Endpoint]:
+        """Endpoints in the order they should be tried for this model."""
+        healthy = [e for e in self.endpoints if e.healthy]
+        # With nothing healthy, try everything rather than fail without a request
+        pool = healthy or self.endpoints
+        return sorted(pool, key=lambda e: (model not in e.loaded_models, e.outstanding))
+
+    async def chat(self, **kwargs) -> Any:
+        model = kwargs.get('model', '')
+        last_error: Optional[Exception] = None
+        for endpoint in self.candidates(model):
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            try:
+                response = await endpoint.client.chat(**kwargs)
+                endpoint.loaded_models.add(model)
+                return response
+            except Exception as e:
+                last_error = e
+                self._record_failure(endpoint, e)
+            finally:
+                endpoint.outstanding -= 1
+        raise last_error or RuntimeError("No Ollama endpoints configured")
+
+    async def stream_chat(self, **kwargs) -> AsyncIterator[Any]:
+        """Streams chunks; fails over only if an endpoint breaks before the first chunk."""
+        model = kwargs.get('model', '')
+        last_error: Optional[Exception] = None
+        for endpoint in self.candidates(model):
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            started = False
+            try:
+                stream = await endpoint.client.chat(**{**kwargs, 'stream': True})
+                try:
+                    async for chunk in stream:
+                        started = True
+                        yield chunk
+                finally:
+                    # Also runs when the caller stops early: closes the response so Ollama stops generating
+                    await stream.aclose()
+                endpoint.loaded_models.add(model)
+                return
+            except Exception as e:
+                last_error = e
+                self._record_failure(endpoint, e)
+                if started:
+                    raise
+            finally:
+                endpoint.outstanding -= 1
+        raise last_error or RuntimeError("No Ollama endpoints configured")
+
+    async def check_health(self):
+        async def check(endpoint: Endpoint):
+            try:
+                running = await endpoint.client.ps()
+                endpoint.loaded_models = {m['model'] for m in running['models']} | \
+                                         {m['name'] for m in running['models'] if m.get('name')}
+                endpoint.healthy = True
+            except Exception as e:
+                endpoint.mark_down(e)
+
+        await asyncio.gather(*(check(endpoint) for endpoint in self.endpoints))
+
+    def start_health_checks(self):
+        """Runs check_health every health_interval seconds; call from the running event loop."""
+        async def loop():
+            while True:
+                await self.check_health()
+                await asyncio.sleep(self.health_interval)
+
+        self._health_task = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "host": e.host,
+                "healthy": e.healthy,
+                "outstanding": e.outstanding,
+                "requests": e.requests,
+                "failures": e.failures,
+                "loaded_models": sorted(e.loaded_models),
+                "last_error": e.last_error,
+            }
+            for e in self.endpoints
+        ]
+
+    def _record_failure(self, endpoint: Endpoint, error: Exception):
+        # A model error (e.g. not pulled on this endpoint) doesn't mean the endpoint is down
+        if isinstance(error, load_ollama().ResponseError) and error.status_code < 500:
+            endpoint.failures += 1
+            endpoint.last_error = str(error)
+        else:
+            endpoint.mark_down(error)
+        print(f"Ollama endpoint {endpoint.host} failed: {error}")
+
+
+_router: Optional[ModelRouter] = None
+
+def get_router() -> ModelRouter:
+    """The process-wide router, configured from the environment on first use."""
+    global _router
+    if _router is None:
+        _router = ModelRouter.from_env()
+    return _router
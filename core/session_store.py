@@ -0,0 +1,322 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from .manager import ConversationManager
+
+# Everything needed to rebuild a session's manager, e.g. agent names/descriptions, topic, mode
+SessionConfig = Dict[str, Any]
+ManagerFactory = Callable[[SessionConfig], ConversationManager]
+
+
+class SessionStore(ABC):
+    """Where the server keeps its ConversationManagers between requests."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ConversationManager]:
+        pass
+
+    @abstractmethod
+    def put(self, session_id: str, manager: ConversationManager, config: SessionConfig):
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str) -> Optional[ConversationManager]:
+        pass
+
+    def record_turn(self, session_id: str, manager: ConversationManager):
+        """Called after every completed turn (including the opener)."""
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        pass
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    # What the server calls. They answer straight away here; stores that do I/O
+    # override them to keep it off the event loop.
+    async def aget(self, session_id: str) -> Optional[ConversationManager]:
+        return self.get(session_id)
+
+    async def aput(self, session_id: str, manager: ConversationManager, config: SessionConfig):
+        self.put(session_id, manager, config)
+
+    async def adelete(self, session_id: str) -> Optional[ConversationManager]:
+        return self.delete(session_id)
+
+    async def arecord_turn(self, session_id: str, manager: ConversationManager):
+        self.record_turn(session_id, manager)
+
+    async def acontains(self, session_id: str) -> bool:
+        return session_id in self
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with LRU and idle-time eviction.
+    Holds at most max_sessions managers; sessions untouched for idle_ttl seconds are dropped.
+    Dropped managers are passed to on_evict, which closes them by default.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 3600,
+                 on_evict: Optional[Callable[[ConversationManager], None]] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict or (lambda manager: manager.close())
+        self._sessions: "OrderedDict[str, tuple[ConversationManager, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+    def get(self, session_id: str) -> Optional[ConversationManager]:
+        with self._lock:
+            self._evict_idle()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (entry[0], time.monotonic())
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def put(self, session_id: str, manager: ConversationManager, config: SessionConfig = None):
+        with self._lock:
+            self._sessions[session_id] = (manager, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            self.created += 1
+            self._evict_idle()
+            while len(self._sessions) > self.max_sessions:
+                _, (evicted, _) = self._sessions.popitem(last=False)
+                self.on_evict(evicted)
+                self.evicted_lru += 1
+
+    def delete(self, session_id: str) -> Optional[ConversationManager]:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        return entry[0] if entry else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._evict_idle()
+            return {
+                "live_sessions": len(self._sessions),
+                "sessions_created": self.created,
+                "evicted_lru": self.evicted_lru,
+                "evicted_idle": self.evicted_idle,
+            }
+
+    def _evict_idle(self):
+        # Entries are kept in access order, so expired ones are all at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, (manager, last_access) = next(iter(self._sessions.items()))
+            if last_access >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.on_evict(manager)
+            self.evicted_idle += 1
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite-backed store that several worker processes can share.
+
+    Each session is a config row plus an append-only turn log. Workers keep rebuilt
+    managers in a local MemorySessionStore and replay the log again whenever another
+    worker has added turns, so any worker can serve any session. Sessions idle for
+    longer than idle_ttl seconds are deleted from the database; last_access is written
+    at most once per touch_interval per session, not on every read. The server uses
+    the async methods, which run the queries in a worker thread; managers dropped
+    there are closed afterwards on the caller's thread, since closing one cancels
+    its prefetch task, which belongs to the event loop.
+    """
+
+    def __init__(self, path: str, factory: ManagerFactory, cache_size: int = 256, idle_ttl: float = 3600,
+                 touch_interval: Optional[float] = None):
+        self.path = path
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        # A session's idle time can be overestimated by this much, so keep it well below idle_ttl
+        self.touch_interval = min(60.0, idle_ttl / 10) if touch_interval is None else touch_interval
+        self._cache = MemorySessionStore(max_sessions=cache_size, idle_ttl=idle_ttl, on_evict=self._evicted_append)
+        self._evicted: List[ConversationManager] = []  # Dropped managers waiting for close()
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # When this worker last wrote each session's last_access
+        self._synced: Dict[str, int] = {}  # Turns of each cached manager known to match the log
+        self.created = 0
+        self.evicted_idle = 0
+        self.replays = 0
+        self.conflicts = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, config TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, speaker TEXT NOT NULL, message TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+
+    def get(self, session_id: str) -> Optional[ConversationManager]:
+        return self._closing_evicted(self._get(session_id))
+
+    def put(self, session_id: str, manager: ConversationManager, config: SessionConfig):
+        self._closing_evicted(self._put(session_id, manager, config))
+
+    def record_turn(self, session_id: str, manager: ConversationManager):
+        self._closing_evicted(self._record_turn(session_id, manager))
+
+    def delete(self, session_id: str) -> Optional[ConversationManager]:
+        return self._closing_evicted(self._delete(session_id))
+
+    async def aget(self, session_id: str) -> Optional[ConversationManager]:
+        return self._closing_evicted(await asyncio.to_thread(self._get, session_id))
+
+    async def aput(self, session_id: str, manager: ConversationManager, config: SessionConfig):
+        self._closing_evicted(await asyncio.to_thread(self._put, session_id, manager, config))
+
+    async def adelete(self, session_id: str) -> Optional[ConversationManager]:
+        return self._closing_evicted(await asyncio.to_thread(self._delete, session_id))
+
+    async def arecord_turn(self, session_id: str, manager: ConversationManager):
+        self._closing_evicted(await asyncio.to_thread(self._record_turn, session_id, manager))
+
+    async def acontains(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self.__contains__, session_id)
+
+    def _evicted_append(self, manager: ConversationManager):
+        self._evicted.append(manager)
+
+    def _closing_evicted(self, result=None):
+        """Closes the managers dropped by the last call, then passes its result through."""
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+        for manager in evicted:
+            manager.close()
+        return result
+
+    def _get(self, session_id: str) -> Optional[ConversationManager]:
+        with self._lock:
+            row = self._db.execute("SELECT config FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                self._drop_cached(session_id)
+                return None
+            self._touch(session_id)
+            turn_count = self._db.execute(
+                "SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+            manager = self._cache.get(session_id)
+            if manager is not None and len(manager.history) == turn_count == self._synced.get(session_id):
+                return manager
+
+            # Not cached here, or another worker has moved the conversation on
+            self._drop_cached(session_id)
+            turns = self._db.execute(
+                "SELECT speaker, message FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            manager = self.factory(json.loads(row[0]))
+            manager.replay(turns)
+            self._cache.put(session_id, manager)
+            self._synced[session_id] = len(turns)
+            self.replays += 1
+            return manager
+
+    def _put(self, session_id: str, manager: ConversationManager, config: SessionConfig):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, config, created, last_access) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(config), now, now),
+            )
+            self._cache.put(session_id, manager)
+            self._touched[session_id] = now
+            self.created += 1
+            self._evict_idle(now)
+        self._record_turn(session_id, manager)
+
+    def _record_turn(self, session_id: str, manager: ConversationManager):
+        with self._lock:
+            turns = manager.history.turns
+            start = self._synced.get(session_id)
+            if start is None:
+                start = self._db.execute(
+                    "SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+            new_turns = [(session_id, seq, turns[seq].name, turns[seq].message) for seq in range(start, len(turns))]
+            # Two workers racing on one session: the first turn for a seq wins
+            inserted = self._db.executemany(
+                "INSERT OR IGNORE INTO turns (session_id, seq, speaker, message) VALUES (?, ?, ?, ?)", new_turns,
+            ).rowcount
+            if inserted < len(new_turns):
+                # This worker lost: its manager holds turns the log doesn't, so the next
+                # get() rebuilds it from the log instead of reusing it
+                self._drop_cached(session_id)
+                self._synced.pop(session_id, None)
+                self.conflicts += 1
+            else:
+                self._synced[session_id] = len(turns)
+
+    def _touch(self, session_id: str):
+        now = time.time()
+        if now - self._touched.get(session_id, 0.0) < self.touch_interval:
+            return
+        self._db.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+        self._touched[session_id] = now
+
+    def _drop_cached(self, session_id: str):
+        manager = self._cache.delete(session_id)
+        if manager is not None:
+            self._evicted.append(manager)
+
+    def _delete(self, session_id: str) -> Optional[ConversationManager]:
+        # The caller closes the manager it gets back
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._touched.pop(session_id, None)
+            self._synced.pop(session_id, None)
+            return self._cache.delete(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            live = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        cache = self._closing_evicted(self._cache.stats())
+        return {
+            "live_sessions": live,
+            "cached_sessions": cache["live_sessions"],
+            "sessions_created": self.created,
+            "evicted_idle": self.evicted_idle,
+            "evicted_cache": cache["evicted_lru"] + cache["evicted_idle"],
+            "replays": self.replays,
+            "conflicts": self.conflicts,
+        }
+
+    def _evict_idle(self, now: float):
+        cutoff = now - self.idle_ttl
+        expired = [row[0] for row in self._db.execute("SELECT id FROM sessions WHERE last_access < ?", (cutoff,))]
+        for session_id in expired:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._touched.pop(session_id, None)
+            self._synced.pop(session_id, None)
+            self._drop_cached(session_id)
+        self.evicted_idle += len(expired)
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Transcripts are JSON Lines: one "session" header record, then one "turn" record per
+# message, in order. Each record is written as soon as it exists, so a file or HTTP
+# stream can be appended to and read back incrementally. The whole stream may be
+# gzip- or zstd-compressed; readers detect which from the first bytes.
+FORMAT_VERSION = 1
+COMPRESSIONS = ("none", "gzip", "zstd")
+EXTENSIONS = {"none": ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+MEDIA_TYPES = {"none": "application/x-ndjson", "gzip": "application/gzip", "zstd": "application/zstd"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+MAX_LINE_BYTES = 1024 * 1024
+# Compressed input can expand enormously, so the decompressed stream has its own caps
+MAX_DECOMPRESSED_BYTES = 16 * 1024 * 1024
+MAX_TURNS = 5000
+INFLATE_CHUNK = 64 * 1024  # Most decompressed output produced per step
+ZSTD_INPUT_STEP = 256  # zstd can't bound its output, so it is fed a few bytes at a time
+
+
+class TranscriptError(ValueError):
+    """Raised for malformed transcripts or unavailable compression."""
+    pass
+
+
+def _zstandard():
+    # Optional dependency, only needed for zstd transcripts
+    try:
+        import zstandard
+    except ImportError:
+        raise TranscriptError("zstd transcripts need the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+
+def header_record(topic: str, agents: List[Dict[str, str]], mode: str = "", model: str = "",
+                  policy: str = "round_robin") -> Dict[str, Any]:
+    return {"type": "session", "version": FORMAT_VERSION, "topic": topic, "agents": agents,
+            "mode": mode, "model": model, "policy": policy, "created": time.time()}
+
+
+def turn_record(seq: int, speaker: str, message: str, meta: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    record = {"type": "turn", "seq": seq, "speaker": speaker, "message": message}
+    if meta:
+        record["meta"] = meta
+    return record
+
+
+def manager_records(manager) -> Iterator[Dict[str, Any]]:
+    """Header plus every recorded turn of a ConversationManager (turn timings go in `meta`)."""
+    first = manager.agents[0]
+    agents = [{"name": agent.name, "description": agent.personality_description} for agent in manager.agents]
+    yield header_record(manager.topic, agents, getattr(first, 'mode', ''), getattr(first, 'model_name', ''),
+                        manager.policy.name)
+    for seq, turn in enumerate(list(manager.history.turns)):
+        yield turn_record(seq, turn.name, turn.message, turn.meta)
+
+
+def encode_records(records: Iterable[Dict[str, Any]], compression: str = "none") -> Iterator[bytes]:
+    """Serializes records one line at a time, compressing the stream if asked."""
+    if compression not in COMPRESSIONS:
+        raise TranscriptError(f"Unknown compression '{compression}' (expected one of: {', '.join(COMPRESSIONS)})")
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    elif compression == "zstd":
+        compressor = _zstandard().ZstdCompressor().compressobj()
+    else:
+        compressor = None
+
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        if compressor is None:
+            yield line
+        else:
+            chunk = compressor.compress(line)
+            if chunk:
+                yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+class TranscriptReader:
+    """
+    Incremental transcript decoder: feed() raw bytes in any chunking and get complete,
+    validated records back. Compression is detected from the first bytes.
+    Decompression happens in bounded steps, and more than `max_bytes` of decompressed
+    data or `max_turns` turns is rejected, so a small compressed upload can't expand
+    into gigabytes.
+    """
+
+    def __init__(self, max_bytes: int = MAX_DECOMPRESSED_BYTES, max_turns: int = MAX_TURNS):
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self.size = 0  # Decompressed bytes seen so far
+        self.header: Optional[Dict[str, Any]] = None
+        self.turns = 0
+        self._pending = b""
+        self._decompressor = None
+        self._started = False
+        self._speakers: set = set()
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        if not self._started:
+            self._pending += data
+            if len(self._pending) < len(ZSTD_MAGIC):
+                return []
+            data, self._pending = self._pending, b""
+            self._start(data)
+        return self._inflate(data)
+
+    def close(self) -> List[Dict[str, Any]]:
+        records = []
+        if not self._started:
+            data, self._pending = self._pending, b""
+            self._start(data)
+            records += self._inflate(data)
+        if self._decompressor is not None and hasattr(self._decompressor, "flush"):
+            records += self._lines(self._decompressor.flush())
+        if self._pending.strip():
+            records += self._lines(b"\n")
+        if self.header is None:
+            raise TranscriptError("Empty transcript")
+        if not self.turns:
+            raise TranscriptError("Transcript has no turns")
+        return records
+
+    def _start(self, data: bytes):
+        self._started = True
+        if data.startswith(GZIP_MAGIC):
+            self._decompressor = zlib.decompressobj(wbits=31)
+        elif data.startswith(ZSTD_MAGIC):
+            self._decompressor = _zstandard().ZstdDecompressor().decompressobj()
+
+    def _inflate(self, data: bytes) -> List[Dict[str, Any]]:
+        if self._decompressor is None:
+            return self._lines(data)
+        records = []
+        if isinstance(self._decompressor, type(zlib.decompressobj())):
+            while True:
+                out = self._decompressor.decompress(data, INFLATE_CHUNK)
+                data = self._decompressor.unconsumed_tail
+                records += self._lines(out)
+                if not data and len(out) < INFLATE_CHUNK:
+                    break
+        else:
+            for start in range(0, len(data), ZSTD_INPUT_STEP):
+                records += self._lines(self._decompressor.decompress(data[start:start + ZSTD_INPUT_STEP]))
+        return records
+
+    def _lines(self, data: bytes) -> List[Dict[str, Any]]:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise TranscriptError(f"Transcript is larger than {self.max_bytes} bytes uncompressed")
+        buffer = self._pending + data
+        *lines, self._pending = buffer.split(b"\n")
+        if len(self._pending) > MAX_LINE_BYTES:
+            raise TranscriptError("Transcript line too long")
+        return [self._validate(line) for line in lines if line.strip()]
+
+    def _validate(self, line: bytes) -> Dict[str, Any]:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise TranscriptError(f"Invalid JSON in transcript: {e}")
+        if not isinstance(record, dict):
+            raise TranscriptError("Transcript records must be JSON objects")
+
+        if self.header is None:
+            if record.get("type") != "session" or not isinstance(record.get("agents"), list):
+                raise TranscriptError("Transcript must start with a session header")
+            version = record.get("version", 0)
+            if not isinstance(version, int) or version > FORMAT_VERSION:
+                raise TranscriptError(f"Unsupported transcript version {version!r}")
+            if not isinstance(record.get("topic", ""), str):
+                raise TranscriptError("The session topic must be a string")
+            # Everything past this point (listing, replay) relies on these shapes
+            for agent in record["agents"]:
+                if not isinstance(agent, dict) or not isinstance(agent.get("name"), str) or not agent["name"]:
+                    raise TranscriptError("Every agent needs a non-empty name")
+                if not isinstance(agent.get("description", ""), str):
+                    raise TranscriptError(f"Agent '{agent['name']}' has an invalid description")
+            self._speakers = {agent["name"] for agent in record["agents"]}
+            self.header = record
+            return record
+
+        if record.get("type") != "turn":
+            raise TranscriptError(f"Unexpected record type '{record.get('type')}'")
+        if self.turns >= self.max_turns:
+            raise TranscriptError(f"Transcript has more than {self.max_turns} turns")
+        if record.get("seq") != self.turns:
+            raise TranscriptError(f"Expected turn {self.turns}, got {record.get('seq')}")
+        speaker = record.get("speaker")
+        if not isinstance(speaker, str) or speaker not in self._speakers or not isinstance(record.get("message"), str):
+            raise TranscriptError(f"Turn {self.turns} has an unknown speaker or no message")
+        if not isinstance(record.get("meta", {}), dict):
+            raise TranscriptError(f"Turn {self.turns} has invalid meta")
+        self.turns += 1
+        return record
+
+
+def read_transcript(path: str, chunk_size: int = 64 * 1024, max_bytes: int = MAX_DECOMPRESSED_BYTES,
+                    max_turns: int = MAX_TURNS) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Loads a transcript file (any compression) as (header, turns)."""
+    reader = TranscriptReader(max_bytes, max_turns)
+    records = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            records += reader.feed(chunk)
+    records += reader.close()
+    return reader.header, [r for r in records if r["type"] == "turn"]
+
+
+class TranscriptStore:
+    """
+    Directory of imported transcripts, named by the hash of their bytes (so re-importing
+    the same file is free). Files are kept exactly as uploaded; parsed transcripts are
+    kept in a small LRU so replaying a showcase conversation doesn't re-read it.
+    """
+
+    ID_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+    def __init__(self, directory: str, max_cached: int = 64, max_bytes: int = 10 * 1024 * 1024,
+                 max_decompressed_bytes: int = MAX_DECOMPRESSED_BYTES, max_turns: int = MAX_TURNS):
+        self.directory = directory
+        self.max_cached = max_cached
+        self.max_bytes = max_bytes  # As uploaded (compressed)
+        self.max_decompressed_bytes = max_decompressed_bytes
+        self.max_turns = max_turns
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]]" = OrderedDict()
+
+    def _path(self, transcript_id: str) -> Optional[str]:
+        if not self.ID_PATTERN.match(transcript_id):
+            return None
+        for extension in EXTENSIONS.values():
+            path = os.path.join(self.directory, transcript_id + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> Tuple[str, Dict[str, Any], int]:
+        """
+        Validates a transcript while spooling it to disk, then files it under its hash.
+        Returns (transcript_id, header, turn count).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        reader = TranscriptReader(self.max_decompressed_bytes, self.max_turns)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise TranscriptError(f"Transcript is larger than {self.max_bytes} bytes")
+                    reader.feed(chunk)
+                    digest.update(chunk)
+                    f.write(chunk)
+            reader.close()
+
+            transcript_id = digest.hexdigest()[:16]
+            if self._path(transcript_id) is None:
+                with open(temp_path, "rb") as f:
+                    magic = f.read(len(ZSTD_MAGIC))
+                compression = "gzip" if magic.startswith(GZIP_MAGIC) else "zstd" if magic == ZSTD_MAGIC else "none"
+                os.replace(temp_path, os.path.join(self.directory, transcript_id + EXTENSIONS[compression]))
+            return transcript_id, reader.header, reader.turns
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load(self, transcript_id: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        if transcript_id in self._cache:
+            self._cache.move_to_end(transcript_id)
+            return self._cache[transcript_id]
+        path = self._path(transcript_id)
+        if path is None:
+            return None
+        transcript = read_transcript(path, max_bytes=self.max_decompressed_bytes, max_turns=self.max_turns)
+        self._cache[transcript_id] = transcript
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return transcript
+
+    def listing(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for filename in sorted(os.listdir(self.directory)):
+            transcript_id = filename.split(".", 1)[0]
+            if filename.endswith(".part") or not self.ID_PATTERN.match(transcript_id):
+                continue
+            try:
+                header, turns = self.load(transcript_id)
+            except (OSError, TranscriptError):
+                continue
+            result.append({"transcript_id": transcript_id, "topic": header.get("topic"),
+                           "agents": [agent.get("name") for agent in header["agents"]],
+                           "mode": header.get("mode"), "turns": len(turns)})
+        return result
@@ -0,0 +1,114 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from .agent_interface import Agent
+from .history import ConversationHistory
+
+
+class TurnPolicy(ABC):
+    """
+    Decides who speaks next in a ConversationManager.
+    Returns one agent for a normal turn, or several to have them all reply to the same
+    transcript concurrently; their replies are then recorded in the order returned.
+    The first agent always opens, so policies are only asked once the history is non-empty.
+    """
+    name = ""
+
+    @abstractmethod
+    def next_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        pass
+
+    async def anext_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        """Async version, for policies that need to call a model to decide."""
+        return self.next_speakers(agents, history)
+
+    def is_finished(self, history: ConversationHistory) -> bool:
+        """Open-ended by default; scripted policies end when the script does."""
+        return False
+
+
+class RoundRobinPolicy(TurnPolicy):
+    """Agents take turns in list order; with two agents this is the classic back-and-forth."""
+    name = "round_robin"
+
+    def next_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        # Derived from the turn count alone, so replaying a stored session needs no extra state
+        return [agents[len(history) % len(agents)]]
+
+
+class ParallelPolicy(TurnPolicy):
+    """
+    Every agent replies to the same transcript at once, then all replies are merged
+    into the history in list order. A round costs one generation's wall time.
+    """
+    name = "parallel"
+
+    def next_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        if len(history) == 1:
+            # Nobody needs to answer their own opening message
+            return agents[1:]
+        return list(agents)
+
+
+class ModeratorPolicy(TurnPolicy):
+    """
+    A separate moderator agent reads the recent transcript and names who speaks next.
+    Falls back to the agent after the last speaker when the answer doesn't name another participant.
+    """
+    name = "moderator"
+
+    def __init__(self, moderator: Agent, recent_turns: int = 6):
+        self.moderator = moderator
+        self.recent_turns = recent_turns
+
+    def _prompt(self, agents: List[Agent], history: ConversationHistory) -> List[Dict[str, str]]:
+        recent = "\n".join(f"{turn.name}: {turn.message}" for turn in history.turns[-self.recent_turns:])
+        names = ", ".join(agent.name for agent in agents)
+        return [{'role': 'user', 'content': (
+            f"Topic: {history.topic}\n\nRecent conversation:\n{recent}\n\n"
+            f"Participants: {names}\n"
+            f"Who should speak next to keep the conversation lively? Answer with the name only."
+        )}]
+
+    def _pick(self, answer: str, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        last = history.turns[-1].name if history.turns else None
+        answer = answer.lower()
+        best: Optional[Agent] = None
+        best_pos = len(answer) + 1
+        for agent in agents:
+            if agent.name == last:
+                continue
+            # "Ada (AI Researcher)" also matches a plain "Ada"
+            for alias in (agent.name, re.split(r"[\s(]", agent.name, maxsplit=1)[0]):
+                pos = answer.find(alias.lower()) if alias else -1
+                if 0 <= pos < best_pos:
+                    best, best_pos = agent, pos
+        if best is None:
+            # Hand over to whoever follows the last speaker
+            names = [agent.name for agent in agents]
+            index = names.index(last) + 1 if last in names else 0
+            return [agents[index % len(agents)]]
+        return [best]
+
+    def next_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        answer = self.moderator.generate_response(self._prompt(agents, history))
+        return self._pick(answer, agents, history)
+
+    async def anext_speakers(self, agents: List[Agent], history: ConversationHistory) -> List[Agent]:
+        answer = await self.moderator.agenerate_response(self._prompt(agents, history))
+        return self._pick(answer, agents, history)
+
+
+POLICIES = ("round_robin", "moderator", "parallel")
+
+
+def create_policy(name: str = "round_robin", moderator: Optional[Agent] = None) -> TurnPolicy:
+    if name == "round_robin":
+        return RoundRobinPolicy()
+    if name == "parallel":
+        return ParallelPolicy()
+    if name == "moderator":
+        if moderator is None:
+            raise ValueError("The moderator policy needs a moderator agent")
+        return ModeratorPolicy(moderator)
+    raise ValueError(f"Unknown turn policy '{name}' (expected one of: {', '.join(POLICIES)})")
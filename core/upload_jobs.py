@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from .concurrency import QueueFullError
+
+# The persona prompt only uses the start of a profile, so extraction can stop here
+PROFILE_CHARS = 4000
+MIN_PROFILE_CHARS = 50
+
+# (profile_text, custom_name) -> (name, description)
+PersonaGenerator = Callable[[str, Optional[str]], Awaitable[Tuple[str, str]]]
+# (job, name, description) -> result dict stored on the job
+PersonaCallback = Callable[["UploadJob", str, str], Awaitable[Dict]]
+
+
+def spool_to_tempfile(fileobj, suffix: str = "") -> Tuple[str, str]:
+    """
+    Copies an upload to a temp file in chunks, hashing it on the way.
+    Returns (path, sha256 hex digest); the caller deletes the file.
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while True:
+            chunk = fileobj.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp.write(chunk)
+        return tmp.name, digest.hexdigest()
+
+
+def extract_profile_text(path: str, filename: str, max_chars: int = PROFILE_CHARS, max_pages: int = 20) -> str:
+    """
+    Extract text content from PDF or plain text files, stopping once max_chars are found.
+    Runs in a worker process.
+    """
+    if filename.lower().endswith('.pdf'):
+        from pypdf import PdfReader  # Only needed once a PDF arrives
+
+        reader = PdfReader(path)
+        parts = []
+        total = 0
+        for i, page in enumerate(reader.pages):
+            if i >= max_pages or total >= max_chars:
+                break
+            text = page.extract_text() or ""
+            parts.append(text)
+            total += len(text)
+        return "".join(parts)
+
+    # Assume plain text
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read(max_chars)
+
+
+@dataclass
+class UploadJob:
+    id: str
+    filename: str
+    custom_name: Optional[str] = None
+    content_hash: str = ""
+    status: str = "queued"  # queued, extracting, generating, done, failed
+    error: Optional[str] = None
+    result: Optional[Dict] = None
+    created: float = field(default_factory=time.time)
+    path: Optional[str] = field(default=None, repr=False)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class UploadJobQueue:
+    """
+    Turns personality uploads into background jobs.
+
+    Text extraction runs in a small process pool as soon as a job is submitted, then
+    the job waits in a queue for one of the persona generation workers. Clients poll
+    get() or long-poll wait() for the outcome. At most max_pending jobs can be
+    unfinished at once, and the max_jobs most recent jobs are remembered.
+    """
+
+    def __init__(self, generate: PersonaGenerator, on_complete: PersonaCallback, extract_workers: int = 2,
+                 generate_workers: int = 1, max_pending: int = 32, max_jobs: int = 256):
+        self.generate = generate
+        self.on_complete = on_complete
+        self.extract_workers = extract_workers
+        self.generate_workers = generate_workers
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._extractions: Set[asyncio.Task] = set()  # Keeps running extraction tasks referenced
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        """Starts the generation workers; call from the running event loop."""
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._generate_worker()) for _ in range(self.generate_workers)]
+
+    async def stop(self):
+        tasks = self._workers + list(self._extractions)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        if self._pool:
+            # Waiting joins the worker processes, which releases the pool's semaphores;
+            # in a thread, since a running extraction has to finish first
+            await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, path: str, filename: str, custom_name: Optional[str] = None,
+               content_hash: str = "") -> UploadJob:
+        pending = [job for job in self._jobs.values() if not job.finished]
+        # The same file is already being processed: share that job
+        for job in pending:
+            if content_hash and job.content_hash == content_hash:
+                os.remove(path)
+                return job
+        if len(pending) >= self.max_pending:
+            raise QueueFullError("Too many uploads in progress")
+
+        job = UploadJob(id=str(uuid.uuid4()), filename=filename, custom_name=custom_name,
+                        content_hash=content_hash, path=path)
+        self._track(job)
+        # The event loop only holds weak references to tasks
+        task = asyncio.create_task(self._extract(job))
+        self._extractions.add(task)
+        task.add_done_callback(self._extractions.discard)
+        return job
+
+    def completed(self, filename: str, content_hash: str, result: Dict) -> UploadJob:
+        """Records a job that was answered without processing, e.g. from a cache."""
+        job = UploadJob(id=str(uuid.uuid4()), filename=filename, content_hash=content_hash,
+                        status="done", result=result)
+        job._changed.set()
+        self._track(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[UploadJob]:
+        """Returns once the job finishes or the timeout passes, whichever is first."""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        try:
+            await asyncio.wait_for(job._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads isn't safe
+            self._pool = ProcessPoolExecutor(max_workers=self.extract_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _extract(self, job: UploadJob):
+        job.status = "extracting"
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(self._executor(), extract_profile_text, job.path, job.filename)
+        except Exception as e:
+            return self._fail(job, f"Could not read file: {e}")
+        finally:
+            os.remove(job.path)
+            job.path = None
+        print(f"[UPLOAD] {job.filename}: extracted {len(text)} chars")
+
+        if len(text.strip()) < MIN_PROFILE_CHARS:
+            return self._fail(job, "Could not extract enough text from file.")
+        job.status = "generating"
+        await self._queue.put((job, text))
+
+    async def _generate_worker(self):
+        while True:
+            job, text = await self._queue.get()
+            try:
+                name, description = await self.generate(text, job.custom_name)
+                job.result = await self.on_complete(job, name, description)
+                job.status = "done"
+                job._changed.set()
+            except Exception as e:
+                self._fail(job, str(e))
+            finally:
+                self._queue.task_done()
+
+    def _fail(self, job: UploadJob, error: str):
+        print(f"[UPLOAD ERROR] {job.filename}: {error}")
+        job.status = "failed"
+        job.error = error
+        job._changed.set()
+
+    def _track(self, job: UploadJob):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest_id = next((job_id for job_id, job in self._jobs.items() if job.finished), None)
+            if oldest_id is None:
+                break
+            del self._jobs[oldest_id]
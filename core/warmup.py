@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from .concurrency import ModelLimiter, model_limiter
+from .prompts import CompiledPrompt
+from .router import Endpoint, ModelRouter, load_ollama
+
+
+class StartupReport:
+    """How long each startup phase took (ms), plus the warm-up's progress; served at /api/startup."""
+
+    def __init__(self, started: float):
+        self.started = started  # perf_counter() when the server module began importing
+        self.phases: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}  # Time since `started` at which a milestone was reached
+        self.status = "off"  # off, running, done, failed
+        self.models_loaded = 0
+        self.prompts_evaluated = 0
+        self.errors: List[str] = []
+
+    def record(self, phase: str, started: float):
+        self.phases[f"{phase}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def mark(self, milestone: str):
+        self.marks[f"{milestone}_ms"] = round((time.perf_counter() - self.started) * 1000, 1)
+
+    def summary(self) -> str:
+        marks = ", ".join(f"{name[:-3]} after {ms:.0f}ms" for name, ms in self.marks.items())
+        phases = ", ".join(f"{name[:-3]} {ms:.0f}ms" for name, ms in self.phases.items())
+        return f"{marks} ({phases})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"warmup": self.status, **self.marks, **self.phases, "models_loaded": self.models_loaded,
+                "prompts_evaluated": self.prompts_evaluated, "errors": self.errors[-20:]}
+
+
+class Warmup:
+    """
+    Gets every Ollama endpoint ready before the first request instead of during it:
+    loads each model with keep_alive (and the same num_ctx as real requests, so it isn't
+    reloaded), then pre-evaluates system prompts so the prefix is already in Ollama's
+    prompt cache. Ollama keeps one cached prefix per parallel slot, so by default each
+    endpoint only gets the last limiter.endpoint_limit(model) prompts of each model
+    (the most likely ones go last); anything sent before those would be evicted again.
+    `sweep` sends every prompt instead. Pre-evaluations take generation slots like any
+    other request, so a background warm-up yields to real traffic instead of delaying it.
+    """
+
+    def __init__(self, router: ModelRouter, models: List[str], prompts: List[CompiledPrompt],
+                 options: Dict[str, Any], keep_alive: str, limiter: ModelLimiter = model_limiter,
+                 sweep: bool = False):
+        self.router = router
+        self.models = models
+        self.prompts = prompts
+        self.options = options
+        self.keep_alive = keep_alive
+        self.limiter = limiter
+        self.sweep = sweep
+
+    def selected_prompts(self) -> List[CompiledPrompt]:
+        """The prompts each endpoint is sent, in order."""
+        if self.sweep:
+            return self.prompts
+        selected = []
+        for model in self.models:
+            prompts = [prompt for prompt in self.prompts if prompt.model == model]
+            selected += prompts[-self.limiter.endpoint_limit(model):]
+        return selected
+
+    async def run(self, report: StartupReport):
+        report.status = "running"
+        started = time.perf_counter()
+        await asyncio.to_thread(load_ollama)  # Off the event loop, which may already be serving
+        report.record("ollama_import", started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(self._load(endpoint, model, report)
+                               for endpoint in self.router.endpoints for model in self.models))
+        report.record("model_load", started)
+
+        prompts = self.selected_prompts()
+        if prompts:
+            started = time.perf_counter()
+            await asyncio.gather(*(self._prefill(endpoint, prompts, report) for endpoint in self.router.endpoints))
+            report.record("prompt_eval", started)
+
+        report.status = "failed" if report.errors and not report.models_loaded else "done"
+        report.mark("warm")
+
+    async def _load(self, endpoint: Endpoint, model: str, report: StartupReport):
+        try:
+            # A chat with no messages only loads the model
+            await endpoint.client.chat(model=model, messages=[], options=self.options, keep_alive=self.keep_alive)
+        except Exception as e:
+            report.errors.append(f"{endpoint.host} {model}: {e}")
+            print(f"[WARMUP] Could not load {model} on {endpoint.host}: {e}")
+            return
+        endpoint.loaded_models.add(model)
+        report.models_loaded += 1
+
+    async def _prefill(self, endpoint: Endpoint, prompts: List[CompiledPrompt], report: StartupReport):
+        # In order, one at a time per endpoint: the last prompts sent are the ones that stay cached
+        for prompt in prompts:
+            if prompt.model not in endpoint.loaded_models:
+                continue
+            try:
+                async with self.limiter.slot(prompt.model, "warmup"):
+                    await endpoint.client.chat(model=prompt.model, messages=[prompt.message],
+                                               options={**self.options, 'num_predict': 1},
+                                               keep_alive=self.keep_alive)
+            except Exception as e:
+                report.errors.append(f"{endpoint.host} prompt {prompt.hash[:8]}: {e}")
+                print(f"[WARMUP] Prompt pre-evaluation failed on {endpoint.host}: {e}")
+                return
+            report.prompts_evaluated += 1
+
+
+def warmup_prompts(personalities, modes: List[str], models: List[str], compiler,
+                   default_mode: Optional[str] = None) -> List[CompiledPrompt]:
+    """Compiles every personality x mode x model system prompt, with `default_mode` ones last."""
+    ordered = sorted(modes, key=lambda mode: mode == default_mode)
+    return [compiler.compile(p.name, p.behavior_description, mode, model)
+            for model in models for mode in ordered for p in personalities]
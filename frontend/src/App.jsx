@@ -5,6 +5,7 @@ function App() {
   const [personalities, setPersonalities] = useState([])
   const [session, setSession] = useState(null)
   const sessionRef = useRef(null)
+  const eventSourceRef = useRef(null)
 
   // Setup Form State
   const [agentA, setAgentA] = useState('')
@@ -92,8 +93,8 @@ function App() {
       setMessages([data.initial_turn])
       setIsDiscussionActive(true)
 
-      // Start polling for next turns
-      processNextTurn(data.session_id)
+      // Let the server drive the next turns and stream them in
+      streamTurns(data.session_id)
 
     } catch (e) {
       setError(e.message)
@@ -101,44 +102,51 @@ function App() {
     }
   }
 
-  const processNextTurn = async (sessionId) => {
-    // Check if stopped
-    if (sessionId !== sessionRef.current) return
+  const streamTurns = (sessionId) => {
+    const source = new EventSource(`${API_URL}/conversation/auto?session_id=${sessionId}`)
+    eventSourceRef.current = source
 
-    try {
-      const res = await fetch(`${API_URL}/conversation/next?session_id=${sessionId}`, {
-        method: 'POST'
+    // Tokens of the turn in progress are shown in a bubble marked `streaming`
+    source.addEventListener('token', (event) => {
+      if (sessionId !== sessionRef.current) return
+      const data = JSON.parse(event.data)
+      setMessages(prev => {
+        const last = prev[prev.length - 1]
+        if (last && last.streaming) {
+          return [...prev.slice(0, -1), { ...last, message: last.message + data.delta }]
+        }
+        return [...prev, { speaker: data.speaker, message: data.delta, session_id: sessionId, streaming: true }]
       })
+    })
 
+    source.addEventListener('turn', (event) => {
       if (sessionId !== sessionRef.current) return
+      const data = JSON.parse(event.data)
+      setMessages(prev => {
+        const last = prev[prev.length - 1]
+        return last && last.streaming ? [...prev.slice(0, -1), data] : [...prev, data]
+      })
+    })
 
-      if (!res.ok) {
-        setIsDiscussionActive(false)
-        setLoading(false)
-        return
-      }
-
-      const data = await res.json()
-
-      if (data.status === 'done') {
-        setIsDiscussionActive(false)
-        setLoading(false)
-        return
-      }
-
-      setMessages(prev => [...prev, data])
-
-      setTimeout(() => {
-        processNextTurn(sessionId)
-      }, 2000)
-
-    } catch (e) {
-      console.error(e)
+    const finish = () => {
+      source.close()
+      if (eventSourceRef.current === source) eventSourceRef.current = null
+      if (sessionId !== sessionRef.current) return
+      setIsDiscussionActive(false)
       setLoading(false)
     }
+    source.addEventListener('done', finish)
+    source.addEventListener('error', finish)
   }
 
   const stopConversation = () => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close()
+      eventSourceRef.current = null
+    }
+    if (sessionRef.current) {
+      fetch(`${API_URL}/conversation/stop?session_id=${sessionRef.current}`, { method: 'POST' })
+    }
     sessionRef.current = null
     setIsDiscussionActive(false)
     setLoading(false)
@@ -175,8 +183,16 @@ function App() {
         throw new Error(err.detail || 'Upload failed')
       }
 
-      const data = await res.json()
-      const newPersonaName = data.name
+      // The persona is generated in the background; long-poll the job until it finishes
+      let job = await res.json()
+      while (job.status !== 'done' && job.status !== 'failed') {
+        const jobRes = await fetch(`${API_URL}/personalities/jobs/${job.job_id}?wait=20`)
+        if (!jobRes.ok) throw new Error('Upload failed')
+        job = await jobRes.json()
+      }
+      if (job.status === 'failed') throw new Error(job.error || 'Upload failed')
+
+      const newPersonaName = job.result.name
       setUploadStatus(`Created: ${newPersonaName}`)
 
       // Refresh personalities list
@@ -5,9 +5,10 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from core.personality_loader import load_personalities
-from core.ollama_client import OllamaAgent
+from core.ollama_client import ModeratorAgent, OllamaAgent
 from core.manager import ConversationManager
-from utils.display import console, print_welcome, print_personalities, select_personality, get_topic, print_turn
+from core.turn_policy import POLICIES, create_policy
+from utils.display import console, print_welcome, print_personalities, select_personalities, select_policy, get_topic, print_turn
 
 def main():
     print_welcome()
@@ -23,26 +24,29 @@ def main():
     print_personalities(personalities)
     
     # Select Agents
-    p1 = select_personality(personalities, "Select Personality for Agent A")
-    console.print(f"Agent A selected: [bold]{p1.name}[/bold]")
-    
-    p2 = select_personality(personalities, "Select Personality for Agent B")
-    console.print(f"Agent B selected: [bold]{p2.name}[/bold]")
+    selected = select_personalities(personalities, "Select the personalities to join")
+    console.print(f"Selected: [bold]{', '.join(p.name for p in selected)}[/bold]")
+    policy_name = select_policy(POLICIES)
     
     # Get Topic
     topic = get_topic()
     
     # Initialize Agents
-    # Assuming 'mistral' is pulled. We could make this configurable later.
-    agent_a = OllamaAgent(name=p1.name, personality_description=p1.behavior_description)
-    agent_b = OllamaAgent(name=p2.name, personality_description=p2.behavior_description)
+    # Uses OLLAMA_MODEL (default 'mistral'), which must already be pulled.
+    participants = [p.name for p in selected]
+    agents = [OllamaAgent(name=p.name, personality_description=p.behavior_description, participants=participants)
+              for p in selected]
+    moderator = None
+    if policy_name == "moderator":
+        moderator = ModeratorAgent()
     
-    manager = ConversationManager(agent_a, agent_b, topic)
+    manager = ConversationManager(agents, topic, policy=create_policy(policy_name, moderator))
+    colors = ["green", "magenta", "cyan", "yellow", "blue", "red"]
     
     # Start Loop
     try:
         for agent, message in manager.start_conversation(rounds=5):
-            color = "green" if agent == agent_a else "magenta"
+            color = colors[agents.index(agent) % len(colors)]
             print_turn(agent.name, color, message)
     except KeyboardInterrupt:
         console.print("\n[red]Conversation interrupted by user.[/red]")
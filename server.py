@@ -1,14 +1,35 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()  # Startup timing includes the imports below
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import os
+import json
 import uuid
+import asyncio
 
 # Import core logic
-from core.personality_loader import load_personalities
-from core.ollama_client import OllamaAgent
+from core.personality_loader import Personality
+from core.personality_registry import PersonalityRegistry
+from core.ollama_client import AsyncOllamaAgent, ModeratorAgent, OllamaSummarizer, KEEP_ALIVE, DEFAULT_OPTIONS, DEFAULT_MODEL
+from core.router import get_router
 from core.manager import ConversationManager
+from core.turn_policy import POLICIES, create_policy
+from core.transcript import TranscriptStore, TranscriptError, COMPRESSIONS, EXTENSIONS, MEDIA_TYPES, manager_records, encode_records
+from core.replay import build_replay_manager
+from core.context import ContextWindow
+from core.concurrency import QueueFullError, model_limiter
+from core.admission import AdmissionController, AdmissionRejected
+from core.session_store import MemorySessionStore, SqliteSessionStore, SessionStore
+from core.response_cache import ResponseCache, DiskResponseCache
+from core.upload_jobs import UploadJob, UploadJobQueue, spool_to_tempfile, PROFILE_CHARS
+from core.persona_cache import PersonaCache
+from core.metrics import metrics, record_turn
+from core.prompts import MODE_INSTRUCTIONS, prompt_compiler
+from core.warmup import StartupReport, Warmup, warmup_prompts
 
 app = FastAPI()
 
@@ -21,22 +42,168 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store persistent state (Keep it simple for now, in-memory)
-sessions: Dict[str, ConversationManager] = {}
-base_personalities = []  # Built-in personalities from disk
-custom_personalities = []  # Session-only custom personalities
+# Built-in personalities from disk (hot reloaded) plus session-only custom ones
+personalities = PersonalityRegistry(os.path.join(os.path.dirname(__file__), 'data', 'personalities'),
+                                    max_custom=int(os.environ.get("CUSTOM_PERSONALITIES_MAX", 50)))
+
+# Context window for long sessions: recent turns verbatim, older ones summarized
+CONTEXT_KEEP_TURNS = int(os.environ.get("CONTEXT_KEEP_TURNS", 12))
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", 3072))
+summarizer = OllamaSummarizer()
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """
+    Off unless RESPONSE_CACHE_SIZE > 0. RESPONSE_CACHE_PATH adds an on-disk SQLite tier.
+    Pair it with OLLAMA_SEED so cached replies match what the model would generate.
+    """
+    size = int(os.environ.get("RESPONSE_CACHE_SIZE", 0))
+    if size <= 0:
+        return None
+    path = os.environ.get("RESPONSE_CACHE_PATH")
+    if path:
+        return DiskResponseCache(path, max_entries=size)
+    return ResponseCache(max_entries=size)
+
+response_cache = create_response_cache()
+
+MAX_AGENTS = int(os.environ.get("MAX_AGENTS", 6))
+
+# Imported transcripts, replayed through the normal turn API without calling the model
+transcripts = TranscriptStore(os.environ.get("TRANSCRIPT_DIR", os.path.join(os.path.dirname(__file__), 'data', 'transcripts')),
+                              max_bytes=int(os.environ.get("TRANSCRIPT_MAX_BYTES", 10 * 1024 * 1024)),
+                              max_decompressed_bytes=int(os.environ.get("TRANSCRIPT_MAX_DECOMPRESSED_BYTES", 16 * 1024 * 1024)),
+                              max_turns=int(os.environ.get("TRANSCRIPT_MAX_TURNS", 5000)))
+
+def build_manager(config: dict) -> ConversationManager:
+    """Creates the manager for a session config (also used to rebuild stored sessions)."""
+    if config.get("replay"):
+        transcript = transcripts.load(config["replay"])
+        if transcript is None:
+            raise KeyError(f"Transcript {config['replay']} not found")
+        return build_replay_manager(*transcript, trace=config.get("trace", False) or SESSION_TRACE)
+
+    # Sessions stored before N-agent support only have agent_a / agent_b
+    agent_configs = config.get("agents") or [config["agent_a"], config["agent_b"]]
+    participants = [a["name"] for a in agent_configs]
+
+    def make_agent(name: str, description: str) -> AsyncOllamaAgent:
+        return AsyncOllamaAgent(name=name, personality_description=description, mode=config["mode"],
+                                cache=response_cache, session_key=config.get("session_id"),
+                                participants=participants)
+
+    agents = [make_agent(a["name"], a["description"]) for a in agent_configs]
+    policy_name = config.get("policy", "round_robin")
+    # Picks speakers but never joins the conversation
+    moderator = ModeratorAgent() if policy_name == "moderator" else None
+    context = ContextWindow(keep_last_turns=CONTEXT_KEEP_TURNS, max_tokens=CONTEXT_MAX_TOKENS, summarizer=summarizer)
+    return ConversationManager(agents, config["topic"], context=context, policy=create_policy(policy_name, moderator),
+                               prefetch=config.get("prefetch", False), trace=config.get("trace", False) or SESSION_TRACE)
+
+def create_session_store() -> SessionStore:
+    """
+    SESSION_STORE=memory (default) keeps sessions in this process.
+    SESSION_STORE=sqlite shares them through SESSION_DB_PATH across worker processes.
+    """
+    idle_ttl = float(os.environ.get("SESSION_IDLE_TTL", 3600))
+    if os.environ.get("SESSION_STORE", "memory") == "sqlite":
+        db_path = os.environ.get("SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), 'data', 'sessions.db'))
+        return SqliteSessionStore(db_path, build_manager, idle_ttl=idle_ttl)
+    return MemorySessionStore(max_sessions=int(os.environ.get("SESSION_MAX", 1000)), idle_ttl=idle_ttl)
+
+sessions = create_session_store()
+
+# Prometheus-style metrics at /metrics; SESSION_TRACE=1 keeps a timing trace for every session
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+SESSION_TRACE = os.environ.get("SESSION_TRACE", "0") == "1"
 
-def get_all_personalities():
-    """Combine base and custom personalities."""
-    return base_personalities + custom_personalities
+metrics.gauge("conversation_sessions_live", "Sessions currently held by the session store",
+              lambda: {(): sessions.stats()["live_sessions"]})
+metrics.gauge("ollama_requests_in_flight", "Generations holding a slot, by model",
+              lambda: {(("model", m),): s["in_flight"] for m, s in model_limiter.stats()["models"].items()})
+metrics.gauge("ollama_requests_waiting", "Generations waiting for a slot, by model",
+              lambda: {(("model", m),): s["waiting"] for m, s in model_limiter.stats()["models"].items()})
+metrics.gauge("ollama_endpoint_healthy", "1 if the endpoint passed its last health check",
+              lambda: {(("host", e["host"]),): float(e["healthy"]) for e in get_router().stats()})
 
-# Load personalities on startup
+metrics.counter("admission_rejected_total", "Requests rejected with 429 by admission control, by reason")
+metrics.gauge("admission_in_flight", "Requests holding a generation slot",
+              lambda: {(): admission.stats()["in_flight"]})
+metrics.gauge("admission_waiting", "Requests waiting for a generation slot",
+              lambda: {(): admission.stats()["waiting"]})
+
+def observe_turn(manager: ConversationManager, endpoint: str, serialize_ms: float):
+    """Adds the serialization span to the manager's last turn timings and records them."""
+    timings = manager.last_timings
+    timings['serialize_ms'] = serialize_ms
+    if METRICS_ENABLED:
+        record_turn(metrics, timings, endpoint, getattr(manager.agents[0], 'model_name', ''))
+
+def timed_json(body: BaseModel, manager: ConversationManager, endpoint: str) -> Response:
+    # Serialized here rather than by FastAPI so the time it takes can be measured
+    started = time.perf_counter()
+    content = body.model_dump_json()
+    observe_turn(manager, endpoint, (time.perf_counter() - started) * 1000)
+    return Response(content=content, media_type="application/json")
+
+# Admission control for the generation endpoints: per-client rate limit, then a global cap
+# on concurrent generations sized to the backends, with a bounded wait queue (429 beyond it)
+# Sized by the limiter's own slot count, so admitted requests don't pile up behind it
+admission = AdmissionController.from_env(backend_capacity=lambda: model_limiter.limit_for(DEFAULT_MODEL))
+ADMISSION_TRUST_PROXY = os.environ.get("ADMISSION_TRUST_PROXY", "0") == "1"
+
+def client_id(request: Request) -> str:
+    """The caller's address; behind a reverse proxy set ADMISSION_TRUST_PROXY=1 to use X-Forwarded-For."""
+    if ADMISSION_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    if METRICS_ENABLED:
+        metrics.inc("admission_rejected_total", reason=exc.reason)
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": exc.retry_after_header})
+
+# Warm-up: WARMUP=1 loads the models and pre-evaluates the system prompts Ollama can keep cached
+# in the background once the server is up, WARMUP=wait holds startup until that's done, WARMUP=0 skips it.
+# WARMUP_PROMPTS=all sends every personality x mode prompt instead, WARMUP_PROMPTS=0 only loads the models
+WARMUP = os.environ.get("WARMUP", "1")
+WARMUP_MODELS = [m.strip() for m in os.environ.get("WARMUP_MODELS", DEFAULT_MODEL).split(",") if m.strip()]
+WARMUP_PROMPTS = os.environ.get("WARMUP_PROMPTS", "1")
+startup = StartupReport(_import_started)
+warmup_task: Optional[asyncio.Task] = None
+
+async def run_warmup():
+    prompts = []
+    sweep = WARMUP_PROMPTS == "all"
+    if WARMUP_PROMPTS != "0":
+        # "debate" is StartRequest's default mode, so its prompts go last and stay cached
+        modes = list(MODE_INSTRUCTIONS) if sweep else ["debate"]
+        prompts = warmup_prompts(personalities.builtin(), modes, WARMUP_MODELS, prompt_compiler, default_mode="debate")
+    warmup = Warmup(get_router(), WARMUP_MODELS, prompts, DEFAULT_OPTIONS, KEEP_ALIVE, sweep=sweep)
+    print(f"[STARTUP] Warming up {', '.join(WARMUP_MODELS)} ({len(warmup.selected_prompts())} system prompts per endpoint)...")
+    await warmup.run(startup)
+    print(f"[STARTUP] Warm-up {startup.status}: {startup.summary()}")
+
+# Load personalities on startup, then warm up the backends
 @app.on_event("startup")
-def startup_event():
-    global base_personalities
-    p_dir = os.path.join(os.path.dirname(__file__), 'data', 'personalities')
-    base_personalities = load_personalities(p_dir)
-    print(f"Loaded {len(base_personalities)} built-in personalities.")
+async def startup_event():
+    global warmup_task
+    startup.record("init", _import_started)  # Imports and module setup
+    summarizer.bind(asyncio.get_running_loop())  # Summaries then go through the limiter and router
+    started = time.perf_counter()
+    count = personalities.load()
+    startup.record("personalities", started)
+    print(f"Loaded {count} built-in personalities.")
+
+    if WARMUP == "wait":
+        await run_warmup()
+    elif WARMUP != "0":
+        warmup_task = asyncio.create_task(run_warmup())
+    startup.mark("serving")
+    print(f"[STARTUP] {startup.summary()}")
 
 # --- Models ---
 class PersonalityModel(BaseModel):
@@ -44,15 +211,20 @@ class PersonalityModel(BaseModel):
     description: str
 
 class StartRequest(BaseModel):
-    agent_a_name: str
-    agent_b_name: str
+    agents: Optional[List[str]] = None  # Two or more personality names; the first one opens
+    agent_a_name: Optional[str] = None  # Two-agent shorthand for agents=[a, b]
+    agent_b_name: Optional[str] = None
+    policy: str = "round_robin"  # round_robin, moderator, parallel
     topic: str
     mode: str = "debate"  # debate, discuss, fight, roast
+    prefetch: bool = False  # Generate the next turn in the background while the client reads this one
+    trace: bool = False  # Keep per-turn timings, served by /api/conversation/trace
 
 class ConversationTurn(BaseModel):
     speaker: str
     message: str
     session_id: str
+    stats: Optional[Dict[str, float]] = None  # Ollama prompt-eval / eval timings for this turn
 
 class SessionResponse(BaseModel):
     session_id: str
@@ -61,95 +233,302 @@ class SessionResponse(BaseModel):
 # --- Endpoints ---
 
 @app.get("/api/personalities", response_model=List[PersonalityModel])
-def get_personalities():
-    all_personalities = get_all_personalities()
-    sorted_personalities = sorted(all_personalities, key=lambda p: p.name.lower())
-    return [
-        PersonalityModel(name=p.name, description=p.behavior_description) 
-        for p in sorted_personalities
-    ]
+async def get_personalities(request: Request):
+    # Pre-serialized by the registry; clients revalidate with If-None-Match
+    body, etag = personalities.listing()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/api/conversation/start", response_model=SessionResponse)
-def start_conversation(req: StartRequest):
-    all_personalities = get_all_personalities()
+async def start_conversation(req: StartRequest, request: Request):
     # Find agents
-    p1 = next((p for p in all_personalities if p.name == req.agent_a_name), None)
-    p2 = next((p for p in all_personalities if p.name == req.agent_b_name), None)
-    
-    if not p1 or not p2:
+    names = req.agents or [req.agent_a_name, req.agent_b_name]
+    if len(names) < 2 or len(names) > MAX_AGENTS or None in names:
+        raise HTTPException(status_code=400, detail=f"Pick between 2 and {MAX_AGENTS} agents")
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Each agent can only join once")
+    if req.policy not in POLICIES:
+        raise HTTPException(status_code=400, detail=f"Unknown turn policy '{req.policy}'")
+
+    found = [personalities.get(name) for name in names]
+    if not all(found):
         raise HTTPException(status_code=404, detail="Personality not found")
         
     # Create session
     session_id = str(uuid.uuid4())
     
-    agent_a = OllamaAgent(name=p1.name, personality_description=p1.behavior_description, mode=req.mode)
-    agent_b = OllamaAgent(name=p2.name, personality_description=p2.behavior_description, mode=req.mode)
-    
-    manager = ConversationManager(agent_a, agent_b, req.topic)
-    sessions[session_id] = manager
+    config = {
+        "session_id": session_id,
+        "agents": [{"name": p.name, "description": p.behavior_description} for p in found],
+        "policy": req.policy,
+        "topic": req.topic,
+        "mode": req.mode,
+        "prefetch": req.prefetch,
+        "trace": req.trace,
+    }
+    async with admission.admit(client_id(request)):
+        return await open_session(config)
+
+async def open_session(config: dict) -> Response:
+    """Registers the session and returns its opening turn."""
+    session_id = config["session_id"]
+    manager = build_manager(config)
+    await sessions.aput(session_id, manager, config)
     
     # Initialize
     try:
-        agent, msg = manager.initialize_conversation()
-        return SessionResponse(
+        agent, msg = await manager.ainitialize_conversation()
+        stats = manager.last_timings  # This turn's, before anything else can run
+        await sessions.arecord_turn(session_id, manager)
+        return timed_json(SessionResponse(
             session_id=session_id,
-            initial_turn=ConversationTurn(speaker=agent.name, message=msg, session_id=session_id)
-        )
+            initial_turn=ConversationTurn(speaker=agent.name, message=msg, session_id=session_id, stats=stats)
+        ), manager, "start")
+    except QueueFullError as e:
+        await sessions.adelete(session_id)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/conversation/next")
-def next_turn(session_id: str):
-    manager = sessions.get(session_id)
+async def next_turn(session_id: str, request: Request):
+    manager = await sessions.aget(session_id)
     if not manager:
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    try:
-        result = manager.next_turn()
-        if result:
-            agent, msg = result
-            return ConversationTurn(speaker=agent.name, message=msg, session_id=session_id)
-        else:
-            return {"status": "done"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    async with admission.admit(client_id(request)):
+        manager.stop_requested = False  # Asking for a turn resumes a stopped conversation (and its prefetching)
+        try:
+            result = await manager.anext_turn()
+            if result:
+                # Recorded with the turn: agent.last_stats may already belong to a prefetch started since
+                stats = manager.last_timings
+                await sessions.arecord_turn(session_id, manager)
+                agent, msg = result
+                return timed_json(ConversationTurn(speaker=agent.name, message=msg, session_id=session_id,
+                                                   stats=stats), manager, "next")
+            else:
+                return {"status": "done"}
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/conversation/reset")
-def reset_conversation(session_id: str):
-    if session_id in sessions:
-        del sessions[session_id]
+async def reset_conversation(session_id: str):
+    manager = await sessions.adelete(session_id)
+    if manager:
+        manager.close()
+    return {"status": "ok"}
+
+@app.get("/api/sessions/stats")
+async def session_stats():
+    return sessions.stats()
+
+@app.get("/api/backends")
+async def backend_stats():
+    return get_router().stats()
+
+@app.get("/api/scheduler/stats")
+async def scheduler_stats():
+    return model_limiter.stats()
+
+@app.get("/api/startup")
+async def startup_stats():
+    """Startup phase timings and warm-up progress."""
+    return startup.to_dict()
+
+@app.get("/api/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/api/conversation/trace")
+async def conversation_trace(session_id: str):
+    """Per-turn timings (ms) for a session started with trace=true (or SESSION_TRACE=1)."""
+    manager = await sessions.aget(session_id)
+    if not manager:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if manager.trace is None:
+        return {"session_id": session_id, "enabled": False, "turns": []}
+    return {"session_id": session_id, "enabled": True, "turns": list(manager.trace)}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@app.post("/api/conversation/stop")
+async def stop_conversation(session_id: str):
+    manager = await sessions.aget(session_id)
+    if not manager:
+        raise HTTPException(status_code=404, detail="Session not found")
+    manager.stop()
     return {"status": "ok"}
 
 
+# --- Streaming (Server-Sent Events) ---
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_turn_events(manager: ConversationManager, session_id: str, endpoint: str = "stream"):
+    """Yields 'token' events while a turn generates, then a 'turn' event with the full message."""
+    speaker = None
+    chunks = []
+    serialize = 0.0
+    async for speaker, chunk in manager.astream_next_turn():
+        chunks.append(chunk)
+        started = time.perf_counter()
+        event = sse_event("token", {"speaker": speaker.name, "delta": chunk, "session_id": session_id})
+        serialize += time.perf_counter() - started
+        yield event
+    if speaker is None:
+        return  # Conversation not started
+    # Recorded with the turn: speaker.last_stats may already belong to a prefetch started since
+    stats = manager.last_timings
+    await sessions.arecord_turn(session_id, manager)
+    started = time.perf_counter()
+    turn = ConversationTurn(speaker=speaker.name, message="".join(chunks), session_id=session_id, stats=stats)
+    event = sse_event("turn", turn.model_dump())
+    observe_turn(manager, endpoint, (serialize + time.perf_counter() - started) * 1000)
+    yield event
+
+@app.get("/api/conversation/stream")
+async def stream_turn(request: Request, session_id: str):
+    """Streams a single turn token by token."""
+    manager = await sessions.aget(session_id)
+    if not manager:
+        raise HTTPException(status_code=404, detail="Session not found")
+    # Rejected with a 429 before the stream starts; waiting for a slot happens inside it
+    admission.check(client_id(request))
+    manager.stop_requested = False  # Asking for a turn resumes a stopped conversation (and its prefetching)
+
+    async def events():
+        try:
+            async with admission.slot():
+                async for event in stream_turn_events(manager, session_id):
+                    yield event
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {"status": "done"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/conversation/auto")
+async def auto_conversation(request: Request, session_id: str, max_turns: int = 0):
+    """
+    Server-driven mode: runs turns back-to-back, streaming each one,
+    until the session is stopped/reset or max_turns is reached (0 = no limit).
+    """
+    manager = await sessions.aget(session_id)
+    if not manager:
+        raise HTTPException(status_code=404, detail="Session not found")
+    client = client_id(request)
+    admission.check(client)
+    manager.stop_requested = False  # A new run; /stop during it ends it after the current turn
+
+    async def events():
+        turns = 0
+        try:
+            while not manager.stop_requested and not manager.finished and await sessions.acontains(session_id):
+                if await request.is_disconnected():
+                    break
+                # Each turn is admitted like a /next call, but over capacity the run backs off instead of failing
+                if turns:
+                    await admission.pace(client)
+                try:
+                    async with admission.slot():
+                        if manager.stop_requested:
+                            break  # /stop arrived while this run waited
+                        async for event in stream_turn_events(manager, session_id, "auto"):
+                            yield event
+                except AdmissionRejected as e:
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                turns += 1
+                if max_turns and turns >= max_turns:
+                    break
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {"status": "done", "turns": turns})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# --- Transcripts ---
+
+@app.get("/api/conversation/export")
+async def export_conversation(session_id: str, compression: str = "none"):
+    """Streams the session as a line-delimited transcript (optionally gzip/zstd compressed)."""
+    manager = await sessions.aget(session_id)
+    if not manager:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if compression not in COMPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown compression '{compression}'")
+    try:
+        chunks = encode_records(manager_records(manager), compression)
+        first = next(chunks)  # Surfaces a missing zstandard package before the response starts
+    except TranscriptError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def body():
+        yield first
+        yield from chunks
+
+    filename = f"conversation-{session_id[:8]}{EXTENSIONS[compression]}"
+    return StreamingResponse(body(), media_type=MEDIA_TYPES[compression],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.post("/api/transcripts/import", status_code=201)
+async def import_transcript(request: Request):
+    """Stores an uploaded transcript (raw request body, any supported compression) for replay."""
+    try:
+        transcript_id, header, turns = await transcripts.save_stream(request.stream())
+    except TranscriptError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"transcript_id": transcript_id, "topic": header.get("topic"),
+            "agents": [agent.get("name") for agent in header["agents"]], "turns": turns}
+
+@app.get("/api/transcripts")
+async def list_transcripts():
+    return transcripts.listing()
+
+@app.post("/api/transcripts/{transcript_id}/replay", response_model=SessionResponse)
+async def replay_transcript(request: Request, transcript_id: str, trace: bool = False):
+    """Starts a session that serves the recorded turns through /next, /stream and /auto."""
+    try:
+        if transcripts.load(transcript_id) is None:
+            raise HTTPException(status_code=404, detail="Transcript not found")
+    except TranscriptError as e:
+        # Stored before the current validation rules
+        raise HTTPException(status_code=400, detail=f"Transcript can't be replayed: {e}")
+    async with admission.admit(client_id(request)):
+        return await open_session({"session_id": str(uuid.uuid4()), "replay": transcript_id, "trace": trace})
+
+
 # --- Upload Custom Personality ---
 from fastapi import UploadFile, File, Form
-from pypdf import PdfReader
-import io
 import re
-import ollama as ollama_client
 
-def extract_text_from_file(file: UploadFile) -> str:
-    """Extract text content from PDF or plain text files."""
-    content = file.file.read()
-    
-    if file.filename.lower().endswith('.pdf'):
-        reader = PdfReader(io.BytesIO(content))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-    else:
-        # Assume plain text
-        return content.decode('utf-8', errors='ignore')
-
-def generate_persona_from_profile(profile_text: str, custom_name: Optional[str] = None) -> tuple[str, str]:
+async def generate_persona_from_profile(profile_text: str, custom_name: Optional[str] = None) -> tuple[str, str]:
     """Use LLM to convert a profile into a persona description."""
     
     prompt = f"""Based on the following profile/resume/bio, create a fun and engaging AI personality persona.
 
 PROFILE:
 ---
-{profile_text[:4000]}  
+{profile_text[:PROFILE_CHARS]}  
 ---
 
 Your task:
@@ -164,10 +543,13 @@ PERSONA:
 CATCHPHRASES: "[phrase1]", "[phrase2]"
 """
     
-    response = ollama_client.chat(
-        model='mistral',
-        messages=[{'role': 'user', 'content': prompt}]
-    )
+    async with model_limiter.slot(DEFAULT_MODEL):
+        response = await get_router().chat(
+            model=DEFAULT_MODEL,
+            messages=[{'role': 'user', 'content': prompt}],
+            options=DEFAULT_OPTIONS,
+            keep_alive=KEEP_ALIVE,
+        )
     
     result = response['message']['content']
     
@@ -186,40 +568,80 @@ CATCHPHRASES: "[phrase1]", "[phrase2]"
     
     return name, full_description
 
-@app.post("/api/personalities/upload")
+# Generated personas by uploaded file hash, so identical uploads skip extraction and the LLM
+persona_cache = PersonaCache(
+    os.environ.get("PERSONA_CACHE_PATH", os.path.join(os.path.dirname(__file__), 'data', 'persona_cache.db')),
+    max_entries=int(os.environ.get("PERSONA_CACHE_SIZE", 256)),
+)
+
+def register_custom_persona(content_hash: str, name: str, description: str) -> dict:
+    """Stores a generated persona in memory (session-only, NOT saved to disk)."""
+    # Every generated persona is called "Custom Persona", so tag it with the file hash to keep names unique
+    unique_name = f"{name} #{content_hash[:6]}" if content_hash else name
+    new_personality = Personality(
+        name=unique_name,
+        behavior_description=f"You are {unique_name}.\n\n{description}",
+        filepath=""  # No file path for session-only
+    )
+    personalities.add_custom(new_personality)
+    return {"name": unique_name, "description": description}
+
+async def add_generated_persona(job: UploadJob, name: str, description: str) -> dict:
+    print(f"[UPLOAD] Generated persona name: '{name}'")
+    print(f"[UPLOAD] Generated description: {description[:200]}...")
+    if job.content_hash:
+        await persona_cache.aput(job.content_hash, name, description)
+    return register_custom_persona(job.content_hash, name, description)
+
+upload_jobs = UploadJobQueue(generate_persona_from_profile, add_generated_persona)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    upload_jobs.start()
+    get_router().start_health_checks()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await upload_jobs.stop()
+    await get_router().stop()
+
+@app.post("/api/personalities/upload", status_code=202)
 async def upload_personality(
+    request: Request,
     file: UploadFile = File(...),
     custom_name: Optional[str] = Form(None)
 ):
-    global custom_personalities
-    
+    """
+    Queues the upload as a background job and returns its id straight away.
+    Poll /api/personalities/jobs/{job_id} for the generated persona.
+    """
+    # Generation runs on the job queue, so only the client's rate limit applies here
+    admission.take(client_id(request))
+    print(f"[UPLOAD] Received file: {file.filename}")
+    # Hand the file to the extraction process on disk rather than in memory
+    suffix = os.path.splitext(file.filename or "")[1]
+    path, content_hash = await asyncio.to_thread(spool_to_tempfile, file.file, suffix)
+
+    cached = await persona_cache.aget(content_hash)
+    if cached:
+        os.remove(path)
+        print(f"[UPLOAD] Same file seen before, reusing its persona")
+        result = register_custom_persona(content_hash, *cached)
+        return upload_jobs.completed(file.filename or "upload", content_hash, result).to_dict()
+
     try:
-        # 1. Extract text
-        print(f"[UPLOAD] Received file: {file.filename}")
-        profile_text = extract_text_from_file(file)
-        print(f"[UPLOAD] Extracted text length: {len(profile_text)} chars")
-        
-        if len(profile_text.strip()) < 50:
-            raise HTTPException(status_code=400, detail="Could not extract enough text from file.")
-        
-        # 2. Generate persona using LLM
-        print(f"[UPLOAD] Generating persona from profile...")
-        name, description = generate_persona_from_profile(profile_text, custom_name)
-        print(f"[UPLOAD] Generated persona name: '{name}'")
-        print(f"[UPLOAD] Generated description: {description[:200]}...")
-        
-        # 3. Store in memory (session-only, NOT saved to disk)
-        from core.personality_loader import Personality
-        new_personality = Personality(
-            name=name,
-            behavior_description=f"You are {name}.\n\n{description}",
-            filepath=""  # No file path for session-only
-        )
-        custom_personalities.append(new_personality)
-        print(f"[UPLOAD] Added to session. Total custom: {len(custom_personalities)}")
-        
-        return {"status": "success", "name": name, "description": description}
-        
-    except Exception as e:
-        print(f"[UPLOAD ERROR] {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        job = upload_jobs.submit(path, file.filename or "upload", custom_name, content_hash)
+    except QueueFullError as e:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.to_dict()
+
+@app.get("/api/personalities/jobs/{job_id}")
+async def upload_status(job_id: str, wait: float = 0):
+    """Job status; with wait > 0 this long-polls up to that many seconds (max 30) for the result."""
+    job = await upload_jobs.wait(job_id, min(wait, 30.0)) if wait > 0 else upload_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
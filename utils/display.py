@@ -13,17 +13,24 @@ def print_personalities(personalities):
     for i, p in enumerate(personalities, 1):
         console.print(f"[green]{i}. {p.name}[/green]: {p.behavior_description.split('.')[0]}.")
 
-def select_personality(personalities, prompt_text: str):
+def select_personalities(personalities, prompt_text: str, minimum: int = 2):
+    """Comma-separated picks, e.g. "1,4,7". Order is speaking order; the first one opens."""
     while True:
-        choice = Prompt.ask(f"[bold yellow]{prompt_text} (1-{len(personalities)})[/bold yellow]")
+        choice = Prompt.ask(f"[bold yellow]{prompt_text} (e.g. 1,3 from 1-{len(personalities)})[/bold yellow]")
         try:
-            index = int(choice) - 1
-            if 0 <= index < len(personalities):
-                return personalities[index]
-            else:
-                console.print("[red]Invalid selection. Please try again.[/red]")
+            indexes = [int(part) - 1 for part in choice.split(",") if part.strip()]
         except ValueError:
-            console.print("[red]Please enter a number.[/red]")
+            console.print("[red]Please enter numbers separated by commas.[/red]")
+            continue
+        if len(indexes) < minimum or len(set(indexes)) != len(indexes):
+            console.print(f"[red]Pick at least {minimum} different personalities.[/red]")
+        elif not all(0 <= index < len(personalities) for index in indexes):
+            console.print("[red]Invalid selection. Please try again.[/red]")
+        else:
+            return [personalities[index] for index in indexes]
+
+def select_policy(policies):
+    return Prompt.ask("[bold yellow]Turn policy[/bold yellow]", choices=list(policies), default=policies[0])
 
 def get_topic():
     return Prompt.ask("\n[bold cyan]Enter the Topic of Discussion[/bold cyan]")